@@ -0,0 +1,26 @@
+"""Switch prague_ku geometry index from GiST to SP-GiST
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Point-in-polygon KÚ lookups (ST_Contains) are served better by SP-GiST
+    op.execute("DROP INDEX IF EXISTS idx_prague_ku_geom")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_prague_ku_geom ON prague_ku USING SPGIST (geom)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_prague_ku_geom")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_prague_ku_geom ON prague_ku USING GIST (geom)")
@@ -0,0 +1,64 @@
+"""Replace search_vector trigger with a generated column
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR_EXPR = """
+    setweight(to_tsvector('simple', COALESCE(title, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(city, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(district, '')), 'B') ||
+    setweight(to_tsvector('simple', COALESCE(address, '')), 'B') ||
+    setweight(to_tsvector('simple', COALESCE(description, '')), 'C')
+"""
+
+
+def upgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_search_vector ON properties")
+    op.execute("DROP FUNCTION IF EXISTS properties_search_vector_update()")
+    op.execute("DROP INDEX IF EXISTS idx_properties_search")
+    op.execute("ALTER TABLE properties DROP COLUMN IF EXISTS search_vector")
+
+    # Existing rows are backfilled automatically when the column is added
+    op.execute(f"""
+        ALTER TABLE properties ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPR}) STORED
+    """)
+    op.create_index('idx_properties_search', 'properties', ['search_vector'],
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_properties_search')
+    op.execute("ALTER TABLE properties DROP COLUMN search_vector")
+    op.execute("ALTER TABLE properties ADD COLUMN search_vector tsvector")
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION properties_search_vector_update()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_EXPR.replace('COALESCE(', 'COALESCE(NEW.')};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_search_vector
+            BEFORE INSERT OR UPDATE OF title, city, district, address, description
+            ON properties
+            FOR EACH ROW
+            EXECUTE FUNCTION properties_search_vector_update();
+    """)
+    op.execute(f"UPDATE properties SET search_vector = {SEARCH_VECTOR_EXPR}")
+    op.create_index('idx_properties_search', 'properties', ['search_vector'],
+                    postgresql_using='gin')
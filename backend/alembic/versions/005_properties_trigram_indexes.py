@@ -0,0 +1,35 @@
+"""Add trigram GIN indexes for city/district ILIKE filters
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Leading-wildcard ILIKE ('%praha%') can only use a trigram index.
+    # Partial on the default listing filter to keep the indexes small.
+    for column in ('city', 'district'):
+        op.create_index(
+            f'idx_properties_{column}_trgm', 'properties', [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+            postgresql_where=sa.text("duplicate_of IS NULL AND status = 'active'"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_properties_district_trgm', 'properties')
+    op.drop_index('idx_properties_city_trgm', 'properties')
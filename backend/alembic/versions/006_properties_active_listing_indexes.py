@@ -0,0 +1,37 @@
+"""Add partial indexes for the default active listing sort orders
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # "newest" listing page, CSV export and map markers: index-only slice
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_active_newest
+            ON properties (first_seen_at DESC, id DESC)
+            INCLUDE (price, size_m2, disposition, title, source, latitude, longitude)
+            WHERE duplicate_of IS NULL AND status = 'active'
+    """)
+    # price_asc / price_desc sorts
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_active_price
+            ON properties (price)
+            INCLUDE (id, first_seen_at)
+            WHERE duplicate_of IS NULL AND status = 'active'
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_active_price")
+    op.execute("DROP INDEX IF EXISTS idx_properties_active_newest")
@@ -0,0 +1,34 @@
+"""Add generated price_m2 column to properties
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        ALTER TABLE properties ADD COLUMN price_m2 NUMERIC(14, 2)
+            GENERATED ALWAYS AS (
+                CASE WHEN size_m2 > 0 THEN price / size_m2 END
+            ) STORED
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_price_m2
+            ON properties (price_m2)
+            WHERE duplicate_of IS NULL AND status = 'active'
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_price_m2")
+    op.execute("ALTER TABLE properties DROP COLUMN price_m2")
@@ -0,0 +1,26 @@
+"""Disable GIN pending list on the properties full-text index
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Scraper upserts write search_vector continuously; without the pending
+    # list each insert updates the index directly instead of periodically
+    # stalling on a large pending-list merge.
+    op.execute("ALTER INDEX idx_properties_search SET (fastupdate = off)")
+
+
+def downgrade() -> None:
+    op.execute("ALTER INDEX idx_properties_search RESET (fastupdate)")
@@ -0,0 +1,78 @@
+"""Add materialized views backing the dashboard stats
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Single-row snapshot of the dashboard counters; the constant bucket
+    # column carries the unique index REFRESH ... CONCURRENTLY requires.
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS mv_property_stats AS
+        SELECT
+            1 AS bucket,
+            (SELECT count(*) FROM properties
+              WHERE status = 'active') AS total_active,
+            (SELECT count(*) FROM properties
+              WHERE status = 'active'
+                AND first_seen_at >= date_trunc('day', now(), 'UTC')) AS new_today,
+            (SELECT count(*) FROM properties
+              WHERE status = 'removed'
+                AND updated_at >= date_trunc('day', now(), 'UTC')) AS removed_today,
+            COALESCE((SELECT jsonb_object_agg(source, cnt) FROM (
+                SELECT source, count(*) AS cnt FROM properties
+                WHERE status = 'active' GROUP BY source) s), '{}'::jsonb) AS by_source,
+            COALESCE((SELECT jsonb_object_agg(property_type, cnt) FROM (
+                SELECT property_type, count(*) AS cnt FROM properties
+                WHERE status = 'active' AND property_type IS NOT NULL
+                GROUP BY property_type) t), '{}'::jsonb) AS by_type,
+            COALESCE((SELECT jsonb_object_agg(transaction_type, cnt) FROM (
+                SELECT transaction_type, count(*) AS cnt FROM properties
+                WHERE status = 'active' AND transaction_type IS NOT NULL
+                GROUP BY transaction_type) t), '{}'::jsonb) AS by_transaction,
+            now() AS refreshed_at
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_property_stats ON mv_property_stats (bucket)")
+
+    # Properties whose lowest price today is below their last price before today
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS mv_price_drops_daily AS
+        WITH bounds AS (
+            SELECT date_trunc('day', now(), 'UTC') AS today_start
+        ),
+        prev AS (
+            SELECT DISTINCT ON (ph.property_id) ph.property_id, ph.price
+            FROM price_history ph, bounds b
+            WHERE ph.recorded_at < b.today_start
+            ORDER BY ph.property_id, ph.recorded_at DESC
+        ),
+        today AS (
+            SELECT ph.property_id, min(ph.price) AS price
+            FROM price_history ph, bounds b
+            WHERE ph.recorded_at >= b.today_start
+            GROUP BY ph.property_id
+        )
+        SELECT
+            (SELECT (today_start AT TIME ZONE 'UTC')::date FROM bounds) AS day,
+            count(*) AS price_drops
+        FROM today
+        JOIN prev ON prev.property_id = today.property_id
+        WHERE today.price < prev.price
+    """)
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_price_drops_daily ON mv_price_drops_daily (day)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_price_drops_daily")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_property_stats")
@@ -0,0 +1,90 @@
+"""Rebuild mv_property_stats as a single-scan aggregate
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The scalar counters come from one pass using FILTER, the three
+    # breakdowns from one pass using GROUPING SETS (bitmask 3/5/6 selects
+    # the source / property_type / transaction_type set respectively).
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_property_stats")
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_property_stats AS
+        WITH bounds AS (
+            SELECT date_trunc('day', now(), 'UTC') AS today_start
+        ),
+        totals AS (
+            SELECT
+                count(*) FILTER (WHERE p.status = 'active') AS total_active,
+                count(*) FILTER (WHERE p.status = 'active'
+                                   AND p.first_seen_at >= b.today_start) AS new_today,
+                count(*) FILTER (WHERE p.status = 'removed'
+                                   AND p.updated_at >= b.today_start) AS removed_today
+            FROM properties p, bounds b
+        ),
+        grouped AS (
+            SELECT
+                source, property_type, transaction_type,
+                GROUPING(source, property_type, transaction_type) AS grp,
+                count(*) AS cnt
+            FROM properties
+            WHERE status = 'active'
+            GROUP BY GROUPING SETS ((source), (property_type), (transaction_type))
+        )
+        SELECT
+            1 AS bucket,
+            t.total_active,
+            t.new_today,
+            t.removed_today,
+            COALESCE((SELECT jsonb_object_agg(source, cnt) FROM grouped
+                      WHERE grp = 3), '{}'::jsonb) AS by_source,
+            COALESCE((SELECT jsonb_object_agg(property_type, cnt) FROM grouped
+                      WHERE grp = 5 AND property_type IS NOT NULL), '{}'::jsonb) AS by_type,
+            COALESCE((SELECT jsonb_object_agg(transaction_type, cnt) FROM grouped
+                      WHERE grp = 6 AND transaction_type IS NOT NULL), '{}'::jsonb) AS by_transaction,
+            now() AS refreshed_at
+        FROM totals t
+    """)
+    op.execute("CREATE UNIQUE INDEX uq_mv_property_stats ON mv_property_stats (bucket)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_property_stats")
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_property_stats AS
+        SELECT
+            1 AS bucket,
+            (SELECT count(*) FROM properties
+              WHERE status = 'active') AS total_active,
+            (SELECT count(*) FROM properties
+              WHERE status = 'active'
+                AND first_seen_at >= date_trunc('day', now(), 'UTC')) AS new_today,
+            (SELECT count(*) FROM properties
+              WHERE status = 'removed'
+                AND updated_at >= date_trunc('day', now(), 'UTC')) AS removed_today,
+            COALESCE((SELECT jsonb_object_agg(source, cnt) FROM (
+                SELECT source, count(*) AS cnt FROM properties
+                WHERE status = 'active' GROUP BY source) s), '{}'::jsonb) AS by_source,
+            COALESCE((SELECT jsonb_object_agg(property_type, cnt) FROM (
+                SELECT property_type, count(*) AS cnt FROM properties
+                WHERE status = 'active' AND property_type IS NOT NULL
+                GROUP BY property_type) t), '{}'::jsonb) AS by_type,
+            COALESCE((SELECT jsonb_object_agg(transaction_type, cnt) FROM (
+                SELECT transaction_type, count(*) AS cnt FROM properties
+                WHERE status = 'active' AND transaction_type IS NOT NULL
+                GROUP BY transaction_type) t), '{}'::jsonb) AS by_transaction,
+            now() AS refreshed_at
+    """)
+    op.execute("CREATE UNIQUE INDEX uq_mv_property_stats ON mv_property_stats (bucket)")
@@ -0,0 +1,71 @@
+"""Add base_city() SQL function and generated properties.base_city column
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQL port of app.reference_prices.get_base_city: normalize the city
+    # string, then take the longest known city key it starts with, falling
+    # back to the first dash-separated token. Keys are CITY_TO_REGION,
+    # longest first, as of this revision.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION base_city(city TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            WITH n AS (
+                SELECT replace(translate(lower(trim(city)),
+                    'áäčďéěíĺľňóôöŕřšťúůüýž',
+                    'aacdeeillnooorrstuuuyz'), ' ', '-') AS norm
+            )
+            SELECT COALESCE(
+                (SELECT k FROM n, unnest(ARRAY[
+                    'rychnov-nad-kneznou', 'jablonec-nad-nisou', 'brandys-nad-labem',
+                    'jindrichuv-hradec', 'frantiskovy-lazne', 'valasske-mezirici',
+                    'ceske-budejovice', 'zdar-nad-sazavou', 'uherske-hradiste',
+                    'marianske-lazne', 'usti-nad-orlici', 'mlada-boleslav',
+                    'usti-nad-labem', 'hradec-kralove', 'havlickuv-brod',
+                    'cesky-krumlov', 'frydek-mistek', 'karlovy-vary', 'kutna-hora',
+                    'strakonice', 'prachatice', 'litomerice', 'ceska-lipa', 'novy-jicin',
+                    'domazlice', 'pardubice', 'pelhrimov', 'prostejov', 'rakovnik',
+                    'rokycany', 'chomutov', 'litvinov', 'kromeriz', 'pribram', 'benesov',
+                    'nymburk', 'klatovy', 'sokolov', 'teplice', 'liberec', 'trutnov',
+                    'chrudim', 'svitavy', 'jihlava', 'hodonin', 'breclav', 'blansko',
+                    'olomouc', 'sumperk', 'jesenik', 'ostrava', 'karvina', 'havirov',
+                    'bruntal', 'kladno', 'beroun', 'melnik', 'tachov', 'semily',
+                    'turnov', 'nachod', 'trebic', 'znojmo', 'vyskov', 'prerov', 'vsetin',
+                    'trinec', 'praha', 'kolin', 'tabor', 'pisek', 'plzen', 'decin',
+                    'louny', 'jicin', 'opava', 'cheb', 'most', 'brno', 'zlin'
+                ]) WITH ORDINALITY AS keys(k, ord)
+                 WHERE n.norm = k OR n.norm LIKE k || '-%'
+                 ORDER BY ord LIMIT 1),
+                (SELECT split_part(norm, '-', 1) FROM n)
+            )
+        $$
+    """)
+    op.execute("""
+        ALTER TABLE properties
+        ADD COLUMN IF NOT EXISTS base_city VARCHAR(200)
+        GENERATED ALWAYS AS (base_city(city)) STORED
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_base_city
+        ON properties (base_city)
+        WHERE status = 'active'
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_base_city")
+    op.execute("ALTER TABLE properties DROP COLUMN IF EXISTS base_city")
+    op.execute("DROP FUNCTION IF EXISTS base_city(TEXT)")
@@ -0,0 +1,50 @@
+"""Add partial indexes for the status-filtered stats aggregates
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Group-by columns of the stats breakdowns: index-only scans over active rows
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_active_dims
+        ON properties (source, property_type, transaction_type)
+        WHERE status = 'active'
+    """)
+    # new_today / removed_today counters (these include duplicates, so the
+    # duplicate_of-filtered listing indexes can't serve them)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_active_first_seen
+        ON properties (first_seen_at)
+        WHERE status = 'active'
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_removed_updated
+        ON properties (updated_at)
+        WHERE status = 'removed'
+    """)
+    # Today's price changes for the price-drop view
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_price_history_recorded_at
+        ON price_history (recorded_at)
+    """)
+    op.execute("ANALYZE properties")
+    op.execute("ANALYZE price_history")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_price_history_recorded_at")
+    op.execute("DROP INDEX IF EXISTS idx_properties_removed_updated")
+    op.execute("DROP INDEX IF EXISTS idx_properties_active_first_seen")
+    op.execute("DROP INDEX IF EXISTS idx_properties_active_dims")
@@ -0,0 +1,85 @@
+"""Add property_last_price snapshot and base price drops on it
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS property_last_price (
+            property_id BIGINT PRIMARY KEY REFERENCES properties(id) ON DELETE CASCADE,
+            price NUMERIC(14, 2) NOT NULL,
+            snapshot_date DATE NOT NULL
+        )
+    """)
+    # Seed with each property's last price before today
+    op.execute("""
+        INSERT INTO property_last_price (property_id, price, snapshot_date)
+        SELECT DISTINCT ON (property_id) property_id, price, (now() AT TIME ZONE 'UTC')::date
+        FROM price_history
+        WHERE recorded_at < date_trunc('day', now(), 'UTC')
+        ORDER BY property_id, recorded_at DESC
+        ON CONFLICT (property_id) DO NOTHING
+    """)
+
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_price_drops_daily")
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_price_drops_daily AS
+        WITH bounds AS (
+            SELECT date_trunc('day', now(), 'UTC') AS today_start
+        ),
+        today AS (
+            SELECT ph.property_id, min(ph.price) AS price
+            FROM price_history ph, bounds b
+            WHERE ph.recorded_at >= b.today_start
+            GROUP BY ph.property_id
+        )
+        SELECT
+            (SELECT (today_start AT TIME ZONE 'UTC')::date FROM bounds) AS day,
+            count(*) AS price_drops
+        FROM today
+        JOIN property_last_price lp ON lp.property_id = today.property_id
+        WHERE today.price < lp.price
+    """)
+    op.execute("CREATE UNIQUE INDEX uq_mv_price_drops_daily ON mv_price_drops_daily (day)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_price_drops_daily")
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_price_drops_daily AS
+        WITH bounds AS (
+            SELECT date_trunc('day', now(), 'UTC') AS today_start
+        ),
+        prev AS (
+            SELECT DISTINCT ON (ph.property_id) ph.property_id, ph.price
+            FROM price_history ph, bounds b
+            WHERE ph.recorded_at < b.today_start
+            ORDER BY ph.property_id, ph.recorded_at DESC
+        ),
+        today AS (
+            SELECT ph.property_id, min(ph.price) AS price
+            FROM price_history ph, bounds b
+            WHERE ph.recorded_at >= b.today_start
+            GROUP BY ph.property_id
+        )
+        SELECT
+            (SELECT (today_start AT TIME ZONE 'UTC')::date FROM bounds) AS day,
+            count(*) AS price_drops
+        FROM today
+        JOIN prev ON prev.property_id = today.property_id
+        WHERE today.price < prev.price
+    """)
+    op.execute("CREATE UNIQUE INDEX uq_mv_price_drops_daily ON mv_price_drops_daily (day)")
+    op.execute("DROP TABLE IF EXISTS property_last_price")
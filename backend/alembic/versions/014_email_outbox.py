@@ -0,0 +1,44 @@
+"""Add email_outbox for subscription notifications
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            subscription_id BIGINT NOT NULL REFERENCES email_subscriptions(id) ON DELETE CASCADE,
+            property_id BIGINT NOT NULL REFERENCES properties(id) ON DELETE CASCADE,
+            kind VARCHAR(20) NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT NOW(),
+            sent_at TIMESTAMPTZ,
+            CONSTRAINT uq_email_outbox UNIQUE (subscription_id, property_id, kind)
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_pending
+        ON email_outbox (subscription_id)
+        WHERE sent_at IS NULL
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_subscriptions_match
+        ON email_subscriptions (transaction_type, property_type)
+        WHERE active = TRUE
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_email_subscriptions_match")
+    op.execute("DROP TABLE IF EXISTS email_outbox")
@@ -0,0 +1,120 @@
+"""Record price history with statement-level triggers
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '015'
+down_revision: Union[str, None] = '014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One INSERT ... SELECT per statement over the transition tables instead
+    # of one INSERT per modified row. updated_at stays with trg_updated_at.
+    op.execute("DROP TRIGGER IF EXISTS trg_price_change ON properties")
+    op.execute("DROP TRIGGER IF EXISTS trg_initial_price ON properties")
+    op.execute("DROP FUNCTION IF EXISTS track_price_change()")
+    op.execute("DROP FUNCTION IF EXISTS record_initial_price()")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_initial_prices()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO price_history (property_id, price, price_per_m2)
+            SELECT n.id, n.price,
+                   CASE WHEN n.size_m2 > 0 THEN ROUND(n.price / n.size_m2, 2) END
+            FROM new_rows n
+            WHERE n.price IS NOT NULL;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_price_changes()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO price_history (property_id, price, price_per_m2)
+            SELECT n.id, n.price,
+                   CASE WHEN n.size_m2 > 0 THEN ROUND(n.price / n.size_m2, 2) END
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE n.price IS NOT NULL
+              AND o.price IS DISTINCT FROM n.price;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_initial_price
+            AFTER INSERT ON properties
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION record_initial_prices()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_price_change
+            AFTER UPDATE ON properties
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION record_price_changes()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_price_change ON properties")
+    op.execute("DROP TRIGGER IF EXISTS trg_initial_price ON properties")
+    op.execute("DROP FUNCTION IF EXISTS record_price_changes()")
+    op.execute("DROP FUNCTION IF EXISTS record_initial_prices()")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION track_price_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF OLD.price IS DISTINCT FROM NEW.price THEN
+                INSERT INTO price_history (property_id, price, price_per_m2)
+                VALUES (
+                    NEW.id,
+                    NEW.price,
+                    CASE WHEN NEW.size_m2 > 0 THEN ROUND(NEW.price / NEW.size_m2, 2) END
+                );
+                NEW.updated_at = NOW();
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_initial_price()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.price IS NOT NULL THEN
+                INSERT INTO price_history (property_id, price, price_per_m2)
+                VALUES (
+                    NEW.id,
+                    NEW.price,
+                    CASE WHEN NEW.size_m2 > 0 THEN ROUND(NEW.price / NEW.size_m2, 2) END
+                );
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_price_change
+            BEFORE UPDATE ON properties
+            FOR EACH ROW
+            EXECUTE FUNCTION track_price_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_initial_price
+            AFTER INSERT ON properties
+            FOR EACH ROW
+            EXECUTE FUNCTION record_initial_price()
+    """)
@@ -0,0 +1,30 @@
+"""Add covering index for the avg-price-m2 aggregates
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '016'
+down_revision: Union[str, None] = '015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Carries every column _compute_avg_prices reads, so its GROUPING SETS
+    # scan can be served index-only for a given transaction/property type
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_avg_price
+        ON properties (transaction_type, property_type)
+        INCLUDE (price_m2, ku_kod, ku_nazev, city, disposition)
+        WHERE status = 'active' AND duplicate_of IS NULL AND price_m2 IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_avg_price")
@@ -0,0 +1,44 @@
+"""Drop properties.ku_nazev in favour of the prague_ku dictionary
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '017'
+down_revision: Union[str, None] = '016'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The KÚ name is fully determined by ku_kod; keep it once in prague_ku
+    # instead of repeating a varchar on every property row
+    op.execute("DROP INDEX IF EXISTS idx_properties_avg_price")
+    op.execute("ALTER TABLE properties DROP COLUMN IF EXISTS ku_nazev")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_avg_price
+        ON properties (transaction_type, property_type)
+        INCLUDE (price_m2, ku_kod, city, disposition)
+        WHERE status = 'active' AND duplicate_of IS NULL AND price_m2 IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_avg_price")
+    op.execute("ALTER TABLE properties ADD COLUMN IF NOT EXISTS ku_nazev VARCHAR(200)")
+    op.execute("""
+        UPDATE properties p SET ku_nazev = ku.ku_nazev
+        FROM prague_ku ku
+        WHERE ku.ku_kod = p.ku_kod
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_avg_price
+        ON properties (transaction_type, property_type)
+        INCLUDE (price_m2, ku_kod, ku_nazev, city, disposition)
+        WHERE status = 'active' AND duplicate_of IS NULL AND price_m2 IS NOT NULL
+    """)
@@ -0,0 +1,39 @@
+"""Add partial filter index for active listings
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '018'
+down_revision: Union[str, None] = '017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Equality filters first, then the price range, over the rows listings and
+    # subscription matching actually read. size_m2 is carried so the size
+    # range can be checked without visiting the heap.
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_active_filter
+        ON properties (transaction_type, property_type, disposition, price)
+        INCLUDE (size_m2)
+        WHERE status = 'active' AND duplicate_of IS NULL
+    """)
+    # City is matched with ILIKE '%...%' (served by idx_properties_city_trgm),
+    # so a btree led by city was never usable for these filters
+    op.execute("DROP INDEX IF EXISTS idx_properties_filters")
+    op.execute("ANALYZE properties")
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_filters
+        ON properties (city, property_type, transaction_type)
+    """)
+    op.execute("DROP INDEX IF EXISTS idx_properties_active_filter")
@@ -0,0 +1,37 @@
+"""Add generated point geometry with GiST index to properties
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '019'
+down_revision: Union[str, None] = '018'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # prague_ku.geom is already covered by SP-GiST (003). The point side of
+    # the KÚ join was rebuilt with ST_MakePoint per row and had no spatial
+    # index; store it once and index it.
+    op.execute("""
+        ALTER TABLE properties
+        ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326)
+        GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)) STORED
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_geom
+        ON properties USING GIST (geom)
+        WHERE ku_kod IS NULL
+    """)
+    op.execute("ANALYZE properties")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_geom")
+    op.execute("ALTER TABLE properties DROP COLUMN IF EXISTS geom")
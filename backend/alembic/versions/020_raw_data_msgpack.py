@@ -0,0 +1,64 @@
+"""Store properties.raw_data as MessagePack in BYTEA
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-15
+
+"""
+import json
+from typing import Sequence, Union
+
+import msgpack
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '020'
+down_revision: Union[str, None] = '019'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def _convert(source: str, target: str, encode) -> None:
+    """Rewrite properties.source into properties.target in id-ordered batches."""
+    conn = op.get_bind()
+    select_batch = sa.text(f"""
+        SELECT id, {source} AS value FROM properties
+        WHERE id > :last_id AND {source} IS NOT NULL
+        ORDER BY id LIMIT :limit
+    """)
+    update_row = sa.text(f"UPDATE properties SET {target} = :value WHERE id = :id")
+    # Re-encoding is not a listing change: keep trg_updated_at from stamping
+    # every row, since updated_at records when removed listings were removed
+    op.execute("ALTER TABLE properties DISABLE TRIGGER trg_updated_at")
+    last_id = 0
+    while True:
+        rows = conn.execute(select_batch, {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(update_row, [{"id": r.id, "value": encode(r.value)} for r in rows])
+        last_id = rows[-1].id
+    op.execute("ALTER TABLE properties ENABLE TRIGGER trg_updated_at")
+
+
+def upgrade() -> None:
+    # raw_data is never queried with JSON operators, only loaded for the
+    # detail view; MessagePack is smaller and skips jsonb parsing
+    op.execute(r"ALTER TABLE properties ADD COLUMN raw_data_packed BYTEA DEFAULT '\x80'::bytea")
+    _convert(
+        "raw_data::text", "raw_data_packed",
+        lambda v: msgpack.packb(json.loads(v), use_bin_type=True),
+    )
+    op.execute("ALTER TABLE properties DROP COLUMN raw_data")
+    op.execute("ALTER TABLE properties RENAME COLUMN raw_data_packed TO raw_data")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE properties ADD COLUMN raw_data_json JSONB DEFAULT '{}'::jsonb")
+    _convert(
+        "raw_data", "raw_data_json",
+        lambda v: json.dumps(msgpack.unpackb(v, raw=False)),
+    )
+    op.execute("ALTER TABLE properties DROP COLUMN raw_data")
+    op.execute("ALTER TABLE properties RENAME COLUMN raw_data_json TO raw_data")
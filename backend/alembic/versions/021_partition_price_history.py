@@ -0,0 +1,148 @@
+"""Partition price_history by month on recorded_at
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '021'
+down_revision: Union[str, None] = '020'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRICE_DROPS_VIEW = """
+    CREATE MATERIALIZED VIEW mv_price_drops_daily AS
+    WITH bounds AS (
+        SELECT date_trunc('day', now(), 'UTC') AS today_start
+    ),
+    today AS (
+        SELECT ph.property_id, min(ph.price) AS price
+        FROM price_history ph, bounds b
+        WHERE ph.recorded_at >= b.today_start
+        GROUP BY ph.property_id
+    )
+    SELECT
+        (SELECT (today_start AT TIME ZONE 'UTC')::date FROM bounds) AS day,
+        count(*) AS price_drops
+    FROM today
+    JOIN property_last_price lp ON lp.property_id = today.property_id
+    WHERE today.price < lp.price
+"""
+
+
+def _swap_table(create_table: str) -> None:
+    """Replace price_history with create_table, copying rows and keeping the id sequence."""
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_price_drops_daily")
+    op.execute("ALTER TABLE price_history RENAME TO price_history_old")
+    op.execute("DROP INDEX IF EXISTS idx_price_history_property")
+    op.execute("DROP INDEX IF EXISTS idx_price_history_recorded_at")
+    op.execute(create_table)
+
+
+def _finish_swap() -> None:
+    op.execute("""
+        INSERT INTO price_history (id, property_id, price, price_per_m2, recorded_at)
+        SELECT id, property_id, price, price_per_m2, COALESCE(recorded_at, now())
+        FROM price_history_old
+    """)
+    op.execute("""
+        CREATE INDEX idx_price_history_property
+        ON price_history (property_id, recorded_at DESC)
+    """)
+    op.execute("CREATE INDEX idx_price_history_recorded_at ON price_history (recorded_at)")
+    op.execute("ALTER SEQUENCE price_history_id_seq OWNED BY price_history.id")
+    op.execute("DROP TABLE price_history_old")
+    op.execute(PRICE_DROPS_VIEW)
+    op.execute("CREATE UNIQUE INDEX uq_mv_price_drops_daily ON mv_price_drops_daily (day)")
+    op.execute("ANALYZE price_history")
+
+
+def upgrade() -> None:
+    # Monthly partitions from from_date's month through months_ahead months
+    # past the current one. Idempotent; the scheduler calls it daily. A missing
+    # month's rows are moved out of the default partition when it is created.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION ensure_price_history_partitions(
+            from_date DATE DEFAULT CURRENT_DATE, months_ahead INT DEFAULT 2
+        )
+        RETURNS VOID AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', from_date)::date;
+            last_month DATE := (date_trunc('month', now() AT TIME ZONE 'UTC')
+                                + make_interval(months => months_ahead))::date;
+            part_name TEXT;
+            range_start TIMESTAMPTZ;
+            range_end TIMESTAMPTZ;
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                part_name := 'price_history_' || to_char(month_start, 'YYYY_MM');
+                range_start := month_start::timestamp AT TIME ZONE 'UTC';
+                range_end := (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+                IF to_regclass(part_name) IS NULL THEN
+                    BEGIN
+                        -- Rows that reached the default partition while this month
+                        -- was missing would block the attach, so move them first
+                        EXECUTE format(
+                            'CREATE TABLE %I (LIKE price_history INCLUDING DEFAULTS)',
+                            part_name
+                        );
+                        IF to_regclass('price_history_default') IS NOT NULL THEN
+                            EXECUTE format(
+                                'WITH moved AS (DELETE FROM price_history_default '
+                                'WHERE recorded_at >= %L AND recorded_at < %L RETURNING *) '
+                                'INSERT INTO %I SELECT * FROM moved',
+                                range_start, range_end, part_name
+                            );
+                        END IF;
+                        EXECUTE format(
+                            'ALTER TABLE price_history ATTACH PARTITION %I '
+                            'FOR VALUES FROM (%L) TO (%L)',
+                            part_name, range_start, range_end
+                        );
+                    EXCEPTION WHEN OTHERS THEN
+                        -- Keep going so later months still get their partitions
+                        RAISE WARNING 'Could not create partition %: %', part_name, SQLERRM;
+                    END;
+                END IF;
+                month_start := (month_start + interval '1 month')::date;
+            END LOOP;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    _swap_table("""
+        CREATE TABLE price_history (
+            id BIGINT NOT NULL DEFAULT nextval('price_history_id_seq'),
+            property_id BIGINT NOT NULL REFERENCES properties(id) ON DELETE CASCADE,
+            price NUMERIC(14, 2) NOT NULL,
+            price_per_m2 NUMERIC(14, 2),
+            recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (id, recorded_at)
+        ) PARTITION BY RANGE (recorded_at)
+    """)
+    op.execute("""
+        SELECT ensure_price_history_partitions(
+            COALESCE((SELECT min(recorded_at) FROM price_history_old)::date, CURRENT_DATE)
+        )
+    """)
+    # Catches rows outside the pre-created months (e.g. if the job stalls)
+    op.execute("CREATE TABLE price_history_default PARTITION OF price_history DEFAULT")
+    _finish_swap()
+
+
+def downgrade() -> None:
+    _swap_table("""
+        CREATE TABLE price_history (
+            id BIGINT PRIMARY KEY DEFAULT nextval('price_history_id_seq'),
+            property_id BIGINT NOT NULL REFERENCES properties(id) ON DELETE CASCADE,
+            price NUMERIC(14, 2) NOT NULL,
+            price_per_m2 NUMERIC(14, 2),
+            recorded_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+    _finish_swap()
+    op.execute("DROP FUNCTION IF EXISTS ensure_price_history_partitions(DATE, INT)")
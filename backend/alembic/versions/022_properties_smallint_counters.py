@@ -0,0 +1,33 @@
+"""Narrow properties.rooms and missed_runs to SMALLINT
+
+Revision ID: 022
+Revises: 021
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '022'
+down_revision: Union[str, None] = '021'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Both stay tiny (room counts, missed runs before removal at 3); one
+    # ALTER so the table is rewritten once
+    op.execute("""
+        ALTER TABLE properties
+            ALTER COLUMN rooms TYPE SMALLINT,
+            ALTER COLUMN missed_runs TYPE SMALLINT
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        ALTER TABLE properties
+            ALTER COLUMN rooms TYPE INTEGER,
+            ALTER COLUMN missed_runs TYPE INTEGER
+    """)
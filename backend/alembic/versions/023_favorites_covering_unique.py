@@ -0,0 +1,38 @@
+"""Make uq_favorite a covering constraint
+
+Revision ID: 023
+Revises: 022
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '023'
+down_revision: Union[str, None] = '022'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Listing a session's favorites reads id, property_id and created_at:
+    # carried in the unique index they become index-only scans. The
+    # constraint (not just an index) is kept for ON CONFLICT ON CONSTRAINT.
+    op.execute("""
+        ALTER TABLE favorites
+            DROP CONSTRAINT uq_favorite,
+            ADD CONSTRAINT uq_favorite UNIQUE (session_id, property_id)
+                INCLUDE (id, created_at)
+    """)
+    # Its session_id prefix serves every lookup the plain index did
+    op.execute("DROP INDEX IF EXISTS idx_favorites_session")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS idx_favorites_session ON favorites (session_id)")
+    op.execute("""
+        ALTER TABLE favorites
+            DROP CONSTRAINT uq_favorite,
+            ADD CONSTRAINT uq_favorite UNIQUE (session_id, property_id)
+    """)
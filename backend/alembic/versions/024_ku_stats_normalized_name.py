@@ -0,0 +1,40 @@
+"""Add normalized KÚ name column with pattern index to ku_price_stats
+
+Revision ID: 024
+Revises: 023
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '024'
+down_revision: Union[str, None] = '023'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # KÚ names were matched with LOWER(TRANSLATE(ku_nazev, ..)) LIKE '%..%',
+    # evaluated per row on every lookup. Store the name in normalize_city()
+    # form ("Nové Město" -> "nove-mesto") so lookups are equality/prefix
+    # matches on an index.
+    op.execute("""
+        ALTER TABLE ku_price_stats
+        ADD COLUMN IF NOT EXISTS ku_nazev_normalized VARCHAR(200)
+        GENERATED ALWAYS AS (
+            replace(translate(lower(trim(ku_nazev)),
+                'áäčďéěíĺľňóôöŕřšťúůüýž',
+                'aacdeeillnooorrstuuuyz'), ' ', '-')
+        ) STORED
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ku_price_stats_nazev_normalized
+        ON ku_price_stats (ku_nazev_normalized varchar_pattern_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_ku_price_stats_nazev_normalized")
+    op.execute("ALTER TABLE ku_price_stats DROP COLUMN IF EXISTS ku_nazev_normalized")
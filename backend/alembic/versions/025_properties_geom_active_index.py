@@ -0,0 +1,29 @@
+"""Add GiST index on point geometry of active, non-duplicate properties
+
+Revision ID: 025
+Revises: 024
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '025'
+down_revision: Union[str, None] = '024'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Deduplication self-joins active listings within 50 m in SQL;
+    # idx_properties_geom only covers rows still waiting for a KÚ code.
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_geom_active
+        ON properties USING GIST (geom)
+        WHERE status = 'active' AND duplicate_of IS NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_geom_active")
@@ -0,0 +1,31 @@
+"""Add partial index matching the KÚ price stats aggregation
+
+Revision ID: 026
+Revises: 025
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '026'
+down_revision: Union[str, None] = '025'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # price_m2 is already a stored generated column (price / size_m2).
+    # compute_ku_price_stats groups by these keys under exactly this
+    # predicate, so it can be answered by an index-only scan in group order.
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_properties_ku_price_m2
+        ON properties (ku_kod, property_type, transaction_type, price_m2)
+        WHERE status = 'active' AND duplicate_of IS NULL
+          AND price_m2 BETWEEN 5000 AND 500000
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_properties_ku_price_m2")
@@ -1,41 +1,69 @@
 import asyncio
-import json
 import logging
 
-import redis.asyncio as aioredis
 from fastapi import APIRouter
 from starlette.responses import StreamingResponse
 
-from app.config import settings
+from app.redis import redis_client
 
 router = APIRouter(prefix="/api/events", tags=["events"])
 logger = logging.getLogger(__name__)
 
+# Static SSE frames, encoded once
+CONNECTED_FRAME = b'data: {"type": "connected"}\n\n'
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+KEEPALIVE_INTERVAL = 30.0
+SUBSCRIBER_QUEUE_SIZE = 32
+
+# One queue per connected SSE client, fed by pubsub_fanout()
+subscribers: set[asyncio.Queue] = set()
+
+
+async def pubsub_fanout():
+    """Single backend-wide subscriber: relay property_updates to every SSE client."""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe("property_updates")
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = message["data"]
+                if isinstance(data, str):
+                    data = data.encode("utf-8")
+                frame = b"data: " + data + b"\n\n"
+                for queue in tuple(subscribers):
+                    try:
+                        queue.put_nowait(frame)
+                    except asyncio.QueueFull:
+                        # Slow client: drop the event rather than block everyone
+                        pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"SSE pubsub fanout failed, resubscribing: {e}")
+            await asyncio.sleep(5)
+        finally:
+            await pubsub.aclose()
+
 
 async def event_generator():
-    """SSE generator that subscribes to Redis property_events channel."""
-    r = aioredis.from_url(settings.redis_url)
-    pubsub = r.pubsub()
-    await pubsub.subscribe("property_updates")
+    """SSE generator fed by the shared pubsub fanout task."""
+    queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    subscribers.add(queue)
 
     try:
-        yield "data: {\"type\": \"connected\"}\n\n"
+        yield CONNECTED_FRAME
         while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=30.0)
-            if message and message["type"] == "message":
-                data = message["data"]
-                if isinstance(data, bytes):
-                    data = data.decode("utf-8")
-                yield f"data: {data}\n\n"
-            else:
-                # Send keepalive every 30s
-                yield ": keepalive\n\n"
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE_FRAME
     except asyncio.CancelledError:
         pass
     finally:
-        await pubsub.unsubscribe("property_updates")
-        await pubsub.aclose()
-        await r.aclose()
+        subscribers.discard(queue)
 
 
 @router.get("/stream")
@@ -1,17 +1,61 @@
-import csv
-import io
+import asyncio
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import Property
+from app.database import engine
 
 router = APIRouter(prefix="/api/export", tags=["export"])
 
+# Column aliases double as the CSV header row emitted by COPY ... HEADER
+EXPORT_SELECT = """
+    SELECT
+        id AS "ID",
+        source AS "Zdroj",
+        COALESCE(title, '') AS "Nazev",
+        COALESCE(property_type, '') AS "Typ",
+        COALESCE(transaction_type, '') AS "Transakce",
+        COALESCE(disposition, '') AS "Dispozice",
+        NULLIF(price, 0) AS "Cena (CZK)",
+        NULLIF(size_m2, 0) AS "Plocha (m2)",
+        ROUND(NULLIF(price_m2, 0), 0) AS "Cena/m2",
+        COALESCE(city, '') AS "Mesto",
+        COALESCE(district, '') AS "Okres",
+        COALESCE(address, '') AS "Adresa",
+        status AS "Status",
+        COALESCE(url, '') AS "URL",
+        to_char(first_seen_at AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI') AS "Prvni videt",
+        to_char(last_seen_at AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI') AS "Posledne videt"
+    FROM properties
+"""
+
+
+async def _stream_copy(sql: str, params: list):
+    """Run COPY (query) TO STDOUT WITH CSV and yield the chunks PostgreSQL emits.
+
+    Uses its own pooled connection: dependency-injected sessions are closed
+    before a StreamingResponse body is consumed.
+    """
+    queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+
+    async def run_copy():
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_from_query(
+                sql, *params, output=queue.put, format="csv", header=True,
+            )
+
+    task = asyncio.create_task(run_copy())
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (chunk := await queue.get()) is not None:
+            yield chunk
+        if not task.cancelled() and task.exception():
+            raise task.exception()
+    finally:
+        task.cancel()
+
 
 @router.get("/csv")
 async def export_csv(
@@ -20,63 +64,32 @@ async def export_csv(
     city: str | None = None,
     status: str = "active",
     source: str | None = None,
-    db: AsyncSession = Depends(get_db),
 ):
     """Export properties as CSV file."""
-    query = select(Property).where(Property.duplicate_of.is_(None))
-
-    if status:
-        query = query.where(Property.status == status)
-    if property_type:
-        query = query.where(Property.property_type == property_type)
-    if transaction_type:
-        query = query.where(Property.transaction_type == transaction_type)
-    if city:
-        query = query.where(Property.city == city)
-    if source:
-        query = query.where(Property.source == source)
-
-    query = query.order_by(Property.first_seen_at.desc()).limit(5000)
-    result = await db.execute(query)
-    properties = result.scalars().all()
+    clauses = ["duplicate_of IS NULL"]
+    params: list = []
 
-    output = io.StringIO()
-    writer = csv.writer(output)
+    for column, value in (
+        ("status", status),
+        ("property_type", property_type),
+        ("transaction_type", transaction_type),
+        ("city", city),
+        ("source", source),
+    ):
+        if value:
+            params.append(value)
+            clauses.append(f"{column} = ${len(params)}")
 
-    # Header
-    writer.writerow([
-        "ID", "Zdroj", "Nazev", "Typ", "Transakce", "Dispozice",
-        "Cena (CZK)", "Plocha (m2)", "Cena/m2", "Mesto", "Okres",
-        "Adresa", "Status", "URL", "Prvni videt", "Posledne videt",
-    ])
-
-    for p in properties:
-        price_m2 = round(float(p.price) / float(p.size_m2), 0) if p.price and p.size_m2 and float(p.size_m2) > 0 else ""
-        writer.writerow([
-            p.id,
-            p.source,
-            p.title or "",
-            p.property_type or "",
-            p.transaction_type or "",
-            p.disposition or "",
-            float(p.price) if p.price else "",
-            float(p.size_m2) if p.size_m2 else "",
-            price_m2,
-            p.city or "",
-            p.district or "",
-            p.address or "",
-            p.status,
-            p.url or "",
-            p.first_seen_at.strftime("%Y-%m-%d %H:%M") if p.first_seen_at else "",
-            p.last_seen_at.strftime("%Y-%m-%d %H:%M") if p.last_seen_at else "",
-        ])
+    sql = (
+        f"{EXPORT_SELECT} WHERE {' AND '.join(clauses)}"
+        " ORDER BY first_seen_at DESC LIMIT 5000"
+    )
 
-    output.seek(0)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M")
     filename = f"nemovitosti_{timestamp}.csv"
 
     return StreamingResponse(
-        iter([output.getvalue()]),
+        _stream_copy(sql, params),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
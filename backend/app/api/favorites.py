@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.api.properties import PROPERTY_RESPONSE_COLUMNS
 from app.database import get_db
-from app.models import Favorite, Property
+from app.models import Favorite
 from app.schemas import FavoriteCreate, FavoriteResponse, FavoriteWithProperty, PropertyResponse
 
 router = APIRouter(prefix="/api/favorites", tags=["favorites"])
@@ -12,33 +15,32 @@ router = APIRouter(prefix="/api/favorites", tags=["favorites"])
 
 @router.post("", response_model=FavoriteResponse, status_code=201)
 async def add_favorite(data: FavoriteCreate, db: AsyncSession = Depends(get_db)):
-    # Check property exists
-    prop = await db.get(Property, data.property_id)
-    if not prop:
+    # Single round-trip: the FK rejects unknown properties, the unique
+    # constraint turns a repeat into an empty RETURNING
+    stmt = (
+        pg_insert(Favorite)
+        .values(session_id=data.session_id, property_id=data.property_id)
+        .on_conflict_do_nothing(constraint="uq_favorite")
+        .returning(Favorite.id, Favorite.session_id, Favorite.property_id, Favorite.created_at)
+    )
+    try:
+        row = (await db.execute(stmt)).first()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Property not found")
 
-    # Check if already favorited
-    existing = await db.execute(
-        select(Favorite).where(
-            Favorite.session_id == data.session_id,
-            Favorite.property_id == data.property_id,
-        )
-    )
-    if existing.scalar_one_or_none():
+    if row is None:
         raise HTTPException(status_code=409, detail="Already in favorites")
 
-    fav = Favorite(session_id=data.session_id, property_id=data.property_id)
-    db.add(fav)
     await db.commit()
-    await db.refresh(fav)
-    return FavoriteResponse.model_validate(fav)
+    return FavoriteResponse.model_validate(row)
 
 
 @router.get("/{session_id}", response_model=list[FavoriteWithProperty])
 async def get_favorites(session_id: str, db: AsyncSession = Depends(get_db)):
     query = (
         select(Favorite)
-        .options(selectinload(Favorite.property))
+        .options(selectinload(Favorite.property).load_only(*PROPERTY_RESPONSE_COLUMNS))
         .where(Favorite.session_id == session_id)
         .order_by(Favorite.created_at.desc())
     )
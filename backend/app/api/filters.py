@@ -16,7 +16,6 @@ async def create_filter(
     uf = UserFilter(**data.model_dump())
     db.add(uf)
     await db.commit()
-    await db.refresh(uf)
     return UserFilterResponse.model_validate(uf)
 
 
@@ -41,29 +40,29 @@ async def get_filter(filter_id: int, db: AsyncSession = Depends(get_db)):
 async def update_filter(
     filter_id: int, data: UserFilterUpdate, db: AsyncSession = Depends(get_db)
 ):
-    query = select(UserFilter).where(UserFilter.id == filter_id)
-    result = await db.execute(query)
-    uf = result.scalar_one_or_none()
+    update_data = data.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_filter(filter_id, db)
+
+    stmt = (
+        update(UserFilter)
+        .where(UserFilter.id == filter_id)
+        .values(**update_data)
+        .returning(UserFilter)
+    )
+    uf = (await db.execute(stmt)).scalar_one_or_none()
     if not uf:
         raise HTTPException(status_code=404, detail="Filter not found")
 
-    update_data = data.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(uf, key, value)
-
     await db.commit()
-    await db.refresh(uf)
     return UserFilterResponse.model_validate(uf)
 
 
 @router.delete("/{filter_id}")
 async def delete_filter(filter_id: int, db: AsyncSession = Depends(get_db)):
-    query = select(UserFilter).where(UserFilter.id == filter_id)
-    result = await db.execute(query)
-    uf = result.scalar_one_or_none()
-    if not uf:
+    stmt = delete(UserFilter).where(UserFilter.id == filter_id).returning(UserFilter.id)
+    if (await db.execute(stmt)).scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Filter not found")
 
-    await db.delete(uf)
     await db.commit()
     return {"ok": True}
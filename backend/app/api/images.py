@@ -1,13 +1,17 @@
+import asyncio
 import hashlib
+import io
 import logging
 from urllib.parse import urlparse
 
 import httpx
-import redis.asyncio as aioredis
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import Response
+from diskcache import FanoutCache
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import FileResponse, Response
 
 from app.config import settings
+from app.http_client import http_client
+from app.redis import redis_client
 
 router = APIRouter(prefix="/api/images", tags=["images"])
 logger = logging.getLogger(__name__)
@@ -23,9 +27,58 @@ ALLOWED_HOSTS = {
 # Cache TTL: 24 hours
 CACHE_TTL = 86400
 
+# Failed origin fetches are remembered briefly so broken URLs aren't refetched
+NEGATIVE_CACHE_TTL = 300
+
+# Only one request fetches a given URL from origin; others wait for the cache
+FETCH_LOCK_TTL = 30
+FETCH_LOCK_POLLS = 20
+FETCH_LOCK_POLL_INTERVAL = 0.25
+
+# Image bytes live on local disk; Redis only keeps the small metadata keys
+# (content type, negative marker, fetch lock) for each URL hash.
+image_cache = FanoutCache(
+    settings.image_cache_dir, shards=8, size_limit=settings.image_cache_size_limit
+)
+
+
+def _disk_path(cache_key: str) -> str | None:
+    """Return the on-disk file backing a cached image, if present."""
+    handle = image_cache.get(cache_key, read=True)
+    if handle is None:
+        return None
+    with handle:
+        return handle.name
+
+
+async def _read_cache(cache_key: str) -> tuple[str | None, bytes | None, bool]:
+    """Return (file_path, content_type, negative) for a cache key."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.get(f"{cache_key}:ct")
+        pipe.exists(f"{cache_key}:neg")
+        content_type, negative = await pipe.execute()
+    path = await asyncio.to_thread(_disk_path, cache_key) if content_type else None
+    return path, content_type, bool(negative)
+
+
+def _cache_headers(etag: str) -> dict[str, str]:
+    return {"Cache-Control": "public, max-age=86400", "ETag": etag, "Vary": "Accept"}
+
+
+def _cached_response(path: str, content_type: bytes, etag: str) -> FileResponse:
+    # FileResponse sends the file with sendfile(2); the bytes never enter Python
+    return FileResponse(
+        path,
+        media_type=content_type.decode() if isinstance(content_type, bytes) else content_type,
+        headers=_cache_headers(etag),
+    )
+
 
 @router.get("/proxy")
-async def proxy_image(url: str = Query(..., description="Image URL to proxy")):
+async def proxy_image(
+    url: str = Query(..., description="Image URL to proxy"),
+    if_none_match: str | None = Header(None),
+):
     """Proxy and cache property images to avoid mixed content and CORS issues."""
     parsed = urlparse(url)
     if not parsed.scheme in ("http", "https"):
@@ -36,30 +89,50 @@ async def proxy_image(url: str = Query(..., description="Image URL to proxy")):
     if not any(host.endswith(allowed) for allowed in ALLOWED_HOSTS):
         raise HTTPException(status_code=403, detail="Host not allowed")
 
-    cache_key = f"img:{hashlib.md5(url.encode()).hexdigest()}"
+    url_hash = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+    cache_key = f"img:{url_hash}"
+
+    # Listing image URLs are immutable, so the URL hash is a stable validator:
+    # revalidating clients get a 304 without touching Redis or the origin
+    etag = f'W/"{url_hash}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers=_cache_headers(etag))
 
-    # Try Redis cache first
+    # Try the cache first (metadata from Redis, body from disk)
+    lock_key = f"{cache_key}:lock"
     try:
-        r = aioredis.from_url(settings.redis_url)
-        cached = await r.get(cache_key)
+        cached, content_type, negative = await _read_cache(cache_key)
         if cached:
-            content_type = await r.get(f"{cache_key}:ct") or b"image/jpeg"
-            await r.aclose()
-            return Response(
-                content=cached,
-                media_type=content_type.decode() if isinstance(content_type, bytes) else content_type,
-                headers={"Cache-Control": "public, max-age=86400"},
-            )
-        await r.aclose()
+            return _cached_response(cached, content_type, etag)
+        if negative:
+            raise HTTPException(status_code=502, detail="Failed to fetch image (cached)")
+
+        # Another request is already fetching this URL: wait for its result
+        if not await redis_client.set(lock_key, b"1", nx=True, ex=FETCH_LOCK_TTL):
+            for _ in range(FETCH_LOCK_POLLS):
+                await asyncio.sleep(FETCH_LOCK_POLL_INTERVAL)
+                cached, content_type, negative = await _read_cache(cache_key)
+                if cached:
+                    return _cached_response(cached, content_type, etag)
+                if negative:
+                    raise HTTPException(status_code=502, detail="Failed to fetch image (cached)")
+    except HTTPException:
+        raise
     except Exception:
         pass
 
     # Fetch from origin
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.get(url, follow_redirects=True)
-            resp.raise_for_status()
+        resp = await http_client.get(url, follow_redirects=True)
+        resp.raise_for_status()
     except httpx.HTTPError as e:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(f"{cache_key}:neg", NEGATIVE_CACHE_TTL, b"1")
+                pipe.delete(lock_key)
+                await pipe.execute()
+        except Exception:
+            pass
         raise HTTPException(status_code=502, detail=f"Failed to fetch image: {e}")
 
     content_type = resp.headers.get("content-type", "image/jpeg")
@@ -68,17 +141,20 @@ async def proxy_image(url: str = Query(..., description="Image URL to proxy")):
 
     body = resp.content
 
-    # Cache in Redis (fire and forget, don't block response)
+    # Cache body on disk and metadata in Redis
     try:
-        r = aioredis.from_url(settings.redis_url)
-        await r.setex(cache_key, CACHE_TTL, body)
-        await r.setex(f"{cache_key}:ct", CACHE_TTL, content_type)
-        await r.aclose()
+        await asyncio.to_thread(
+            image_cache.set, cache_key, io.BytesIO(body), expire=CACHE_TTL, read=True
+        )
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.setex(f"{cache_key}:ct", CACHE_TTL, content_type)
+            pipe.delete(lock_key)
+            await pipe.execute()
     except Exception:
         pass
 
     return Response(
         content=body,
         media_type=content_type,
-        headers={"Cache-Control": "public, max-age=86400"},
+        headers=_cache_headers(etag),
     )
@@ -1,14 +1,20 @@
+import base64
+import hashlib
+import logging
 import math
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func, and_, text
+from fastapi.responses import Response
+from sqlalchemy import select, func, and_, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import load_only, selectinload, undefer_group
 
 from app.database import get_db
 from app.models import Property, PriceHistory
+from app.redis import redis_client
 from app.schemas import (
     PropertyResponse,
     PropertyDetailResponse,
@@ -17,18 +23,69 @@ from app.schemas import (
 )
 
 router = APIRouter(prefix="/api/properties", tags=["properties"])
+logger = logging.getLogger(__name__)
+
+
+_LIKE_ESCAPES = str.maketrans({"\\": "\\\\", "%": "\\%", "_": "\\_"})
 
 
 def escape_like(value: str) -> str:
     """Escape special LIKE characters (%, _) in user input."""
-    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return value.translate(_LIKE_ESCAPES)
+
+
+VALID_SORTS = frozenset({"newest", "price_asc", "price_desc", "size_asc", "size_desc"})
+VALID_STATUSES = frozenset({"active", "removed", "sold"})
+VALID_PROPERTY_TYPES = frozenset({"byt", "dum", "pozemek", "komercni"})
+VALID_TRANSACTION_TYPES = frozenset({"prodej", "pronajem"})
+VALID_SOURCES = frozenset({"sreality", "bezrealitky", "idnes"})
+
+# Columns read by PropertyResponse; skips raw_data, search_vector and KÚ fields
+PROPERTY_RESPONSE_COLUMNS = (
+    Property.id, Property.source, Property.external_id, Property.url,
+    Property.title, Property.description, Property.property_type,
+    Property.transaction_type, Property.disposition, Property.price,
+    Property.price_currency, Property.size_m2, Property.rooms,
+    Property.latitude, Property.longitude, Property.city, Property.district,
+    Property.address, Property.images, Property.status, Property.duplicate_of,
+    Property.first_seen_at, Property.last_seen_at, Property.created_at,
+    Property.updated_at,
+)
+
+# Map marker cache: keys embed a generation counter that scrapers bump
+# after each run, so stale entries are simply never read again.
+MARKERS_CACHE_TTL = 300
+MARKERS_GENERATION_KEY = "markers:generation"
 
+# List totals are counted up to this many rows, then reported as estimated
+EXACT_COUNT_THRESHOLD = 10000
 
-VALID_SORTS = {"newest", "price_asc", "price_desc", "size_asc", "size_desc"}
-VALID_STATUSES = {"active", "removed", "sold"}
-VALID_PROPERTY_TYPES = {"byt", "dum", "pozemek", "komercni"}
-VALID_TRANSACTION_TYPES = {"prodej", "pronajem"}
-VALID_SOURCES = {"sreality", "bezrealitky", "idnes"}
+
+def encode_cursor(first_seen_at: datetime, property_id: int) -> str:
+    """Encode a keyset pagination cursor for the "newest" sort."""
+    raw = f"{first_seen_at.isoformat()}|{property_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor(). Raises ValueError if malformed."""
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    ts, property_id = raw.rsplit("|", 1)
+    return datetime.fromisoformat(ts), int(property_id)
+
+
+async def fast_count(
+    db: AsyncSession, query, threshold: int = EXACT_COUNT_THRESHOLD
+) -> tuple[int, bool]:
+    """Count rows matched by query, stopping at threshold.
+
+    Returns (total, estimated). The count runs over query LIMIT threshold,
+    so large result sets cost at most threshold rows; when the cap is hit
+    the total is reported as threshold with estimated=True.
+    """
+    capped = query.limit(threshold).subquery()
+    total = (await db.execute(select(func.count()).select_from(capped))).scalar() or 0
+    return total, total >= threshold
 
 
 @router.get("", response_model=PropertyListResponse)
@@ -48,22 +105,26 @@ async def list_properties(
     source: str | None = None,
     sort: str = "newest",
     search: str | None = None,
+    cursor: str | None = None,
     db: AsyncSession = Depends(get_db),
 ):
-    query = select(Property).where(Property.duplicate_of.is_(None))
+    query = (
+        select(Property)
+        .options(load_only(*PROPERTY_RESPONSE_COLUMNS))
+        .where(Property.duplicate_of.is_(None))
+    )
 
-    if status:
-        if status not in VALID_STATUSES:
-            raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
-        query = query.where(Property.status == status)
-    if property_type:
-        if property_type not in VALID_PROPERTY_TYPES:
-            raise HTTPException(status_code=400, detail=f"Invalid property_type: {property_type}")
-        query = query.where(Property.property_type == property_type)
-    if transaction_type:
-        if transaction_type not in VALID_TRANSACTION_TYPES:
-            raise HTTPException(status_code=400, detail=f"Invalid transaction_type: {transaction_type}")
-        query = query.where(Property.transaction_type == transaction_type)
+    # Enum filters: validated against a fixed set, compared exactly (no LIKE)
+    for name, value, valid, column in (
+        ("status", status, VALID_STATUSES, Property.status),
+        ("property_type", property_type, VALID_PROPERTY_TYPES, Property.property_type),
+        ("transaction_type", transaction_type, VALID_TRANSACTION_TYPES, Property.transaction_type),
+        ("source", source, VALID_SOURCES, Property.source),
+    ):
+        if value:
+            if value not in valid:
+                raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+            query = query.where(column == value)
     if city:
         escaped = escape_like(city)
         query = query.where(Property.city.ilike(f"%{escaped}%", escape="\\"))
@@ -81,27 +142,21 @@ async def list_properties(
         query = query.where(Property.size_m2 >= size_min)
     if size_max is not None:
         query = query.where(Property.size_m2 <= size_max)
-    if source:
-        if source not in VALID_SOURCES:
-            raise HTTPException(status_code=400, detail=f"Invalid source: {source}")
-        query = query.where(Property.source == source)
     if search:
         search_stripped = search.strip()
         if search_stripped:
             # Use PostgreSQL full-text search with tsvector/tsquery
-            ts_query = func.plainto_tsquery("simple", search_stripped)
+            ts_query = func.websearch_to_tsquery("simple", search_stripped)
             query = query.where(Property.search_vector.op("@@")(ts_query))
 
-    # Count total
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_query)).scalar() or 0
+    total, estimated = await fast_count(db, query)
 
     # Sort
     if sort not in VALID_SORTS:
         sort = "newest"
 
     if sort == "newest":
-        query = query.order_by(Property.first_seen_at.desc())
+        query = query.order_by(Property.first_seen_at.desc(), Property.id.desc())
     elif sort == "price_asc":
         query = query.order_by(Property.price.asc().nullslast())
     elif sort == "price_desc":
@@ -111,12 +166,28 @@ async def list_properties(
     elif sort == "size_desc":
         query = query.order_by(Property.size_m2.desc().nullslast())
 
-    # Paginate
-    offset = (page - 1) * per_page
-    query = query.offset(offset).limit(per_page)
+    # Paginate (fetch one extra row to learn whether a next page exists).
+    # A cursor switches the "newest" sort to keyset pagination.
+    if cursor and sort == "newest":
+        try:
+            cursor_ts, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(
+            tuple_(Property.first_seen_at, Property.id) < tuple_(cursor_ts, cursor_id)
+        )
+    else:
+        query = query.offset((page - 1) * per_page)
+    query = query.limit(per_page + 1)
 
     result = await db.execute(query)
     items = result.scalars().all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    next_cursor = None
+    if has_more and sort == "newest":
+        next_cursor = encode_cursor(items[-1].first_seen_at, items[-1].id)
 
     return PropertyListResponse(
         items=[PropertyResponse.model_validate(p) for p in items],
@@ -124,6 +195,9 @@ async def list_properties(
         page=page,
         per_page=per_page,
         pages=math.ceil(total / per_page) if total > 0 else 0,
+        has_more=has_more,
+        estimated_total=estimated,
+        next_cursor=next_cursor,
     )
 
 
@@ -143,7 +217,33 @@ async def get_map_markers(
     search: str | None = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """Return minimal property data for map markers."""
+    """Return minimal property data for map markers as parallel column arrays."""
+    filters = {
+        "property_type": property_type,
+        "transaction_type": transaction_type,
+        "city": city,
+        "disposition": disposition,
+        "price_min": price_min,
+        "price_max": price_max,
+        "size_min": size_min,
+        "size_max": size_max,
+        "source": source,
+        "search": search,
+    }
+    filters_hash = hashlib.blake2b(
+        orjson.dumps(filters, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).hexdigest()
+
+    cache_key = None
+    try:
+        generation = (await redis_client.get(MARKERS_GENERATION_KEY) or b"0").decode()
+        cache_key = f"markers:{generation}:{filters_hash}"
+        cached = await redis_client.get(cache_key)
+        if cached:
+            return Response(content=cached, media_type="application/json")
+    except Exception as e:
+        logger.warning(f"Markers cache read failed: {e}")
+
     query = select(
         Property.id,
         Property.latitude,
@@ -183,32 +283,43 @@ async def get_map_markers(
     if search:
         search_stripped = search.strip()
         if search_stripped:
-            ts_query = func.plainto_tsquery("simple", search_stripped)
+            ts_query = func.websearch_to_tsquery("simple", search_stripped)
             query = query.where(Property.search_vector.op("@@")(ts_query))
 
     query = query.limit(2000)
     result = await db.execute(query)
 
-    markers = []
-    for row in result.all():
-        markers.append({
-            "id": row.id,
-            "lat": row.latitude,
-            "lng": row.longitude,
-            "price": float(row.price) if row.price else None,
-            "disposition": row.disposition,
-            "title": row.title,
-            "source": row.source,
-        })
+    # Columnar payload: one array per field instead of one object per marker
+    rows = result.all()
+    ids, lats, lngs, prices, dispositions, titles, sources = (
+        zip(*rows) if rows else ((),) * 7
+    )
+    markers = {
+        "id": ids,
+        "lat": lats,
+        "lng": lngs,
+        "price": [float(p) if p else None for p in prices],
+        "disposition": dispositions,
+        "title": titles,
+        "source": sources,
+    }
+
+    body = orjson.dumps(markers)
+
+    if cache_key:
+        try:
+            await redis_client.setex(cache_key, MARKERS_CACHE_TTL, body)
+        except Exception as e:
+            logger.warning(f"Markers cache write failed: {e}")
 
-    return markers
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{property_id}", response_model=PropertyDetailResponse)
 async def get_property(property_id: int, db: AsyncSession = Depends(get_db)):
     query = (
         select(Property)
-        .options(selectinload(Property.price_history))
+        .options(selectinload(Property.price_history), undefer_group("detail"))
         .where(Property.id == property_id)
     )
     result = await db.execute(query)
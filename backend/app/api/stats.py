@@ -1,181 +1,113 @@
-from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, func, and_, case
+from fastapi.responses import Response
+from sqlalchemy import Row, select, func, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import Property, PriceHistory, ScrapeRun
+from app.cache import cached, fixed_ttl, until_midnight_or_next_scrape
+from app.database import async_session, get_db
+from app.redis import redis_client
+from app.models import Property, PragueKU
 from app.schemas import StatsResponse
+from app.services.stats_counters import read_counters
 from app.reference_prices import (
-    get_reference_price_async,
+    get_reference_prices_bulk,
     normalize_city,
-    get_base_city,
     get_city_display_name,
 )
 
 router = APIRouter(prefix="/api/stats", tags=["stats"])
+logger = logging.getLogger(__name__)
+
+STATS_QUERY = text("""
+    SELECT
+        s.total_active,
+        s.new_today,
+        s.removed_today,
+        s.by_source,
+        s.by_type,
+        s.by_transaction,
+        COALESCE(
+            (SELECT d.price_drops FROM mv_price_drops_daily d WHERE d.day = :today), 0
+        ) AS price_drops_today
+    FROM mv_property_stats s
+""")
+
+# Statements are built once at import; per request only parameters are bound
+# Postgres assembles the JSON array itself; the handler returns the bytes as-is
+SCRAPE_RUNS_QUERY = text("""
+    SELECT COALESCE(json_agg(r ORDER BY r.started_at DESC), '[]'::json)::text
+    FROM (
+        SELECT id, source, started_at, finished_at,
+               listings_found, listings_new, listings_updated, status
+        FROM scrape_runs
+        ORDER BY started_at DESC
+        LIMIT :limit
+    ) r
+""")
+
+# base_city is a generated column (see the base_city() SQL function), so
+# street-level city strings are merged by the GROUP BY itself
+CITIES_QUERY = (
+    select(Property.base_city, func.count().label("cnt"))
+    .where(Property.status == "active", Property.base_city.isnot(None), Property.base_city != "")
+    .group_by(Property.base_city)
+    .order_by(func.count().desc())
+    .limit(50)
+)
 
 
 @router.get("", response_model=StatsResponse)
+@cached("summary", until_midnight_or_next_scrape)
 async def get_stats(db: AsyncSession = Depends(get_db)):
-    today_start = datetime.now(timezone.utc).replace(
-        hour=0, minute=0, second=0, microsecond=0
-    )
+    """Return dashboard counters.
 
-    # Total active
-    total_active = (
-        await db.execute(
-            select(func.count()).where(Property.status == "active")
-        )
-    ).scalar() or 0
-
-    # New today
-    new_today = (
-        await db.execute(
-            select(func.count()).where(
-                Property.first_seen_at >= today_start,
-                Property.status == "active",
-            )
-        )
-    ).scalar() or 0
-
-    # Price drops today: count properties where today's price_history entry
-    # is lower than the previous entry (actual price decrease, not just any change)
-    prev_price = (
-        select(
-            PriceHistory.property_id,
-            PriceHistory.price,
-            func.row_number().over(
-                partition_by=PriceHistory.property_id,
-                order_by=PriceHistory.recorded_at.desc(),
-            ).label("rn"),
-        )
-        .where(PriceHistory.recorded_at < today_start)
-        .subquery()
-    )
-    latest_prev = (
-        select(prev_price.c.property_id, prev_price.c.price)
-        .where(prev_price.c.rn == 1)
-        .subquery()
-    )
-    today_price = (
-        select(
-            PriceHistory.property_id,
-            func.min(PriceHistory.price).label("price"),
-        )
-        .where(PriceHistory.recorded_at >= today_start)
-        .group_by(PriceHistory.property_id)
-        .subquery()
-    )
-    price_drops_today = (
-        await db.execute(
-            select(func.count()).select_from(
-                today_price.join(
-                    latest_prev,
-                    today_price.c.property_id == latest_prev.c.property_id,
-                )
-            ).where(today_price.c.price < latest_prev.c.price)
+    Active-listing totals come from the Redis counters maintained by the
+    scrapers (app.services.stats_counters); daily counts from the materialized
+    views refreshed by scrapers.scheduler. Falls back to the views entirely
+    if the counters have not been seeded.
+    """
+    today = datetime.now(timezone.utc).date()
+    row = (
+        await db.execute(STATS_QUERY, {"today": today})
+    ).mappings().first()
+    if row is None:
+        return StatsResponse(
+            total_active=0, new_today=0, price_drops_today=0, removed_today=0,
+            by_source={}, by_type={}, by_transaction={},
         )
-    ).scalar() or 0
 
-    # Removed today
-    removed_today = (
-        await db.execute(
-            select(func.count()).where(
-                Property.status == "removed",
-                Property.updated_at >= today_start,
-            )
-        )
-    ).scalar() or 0
+    stats = dict(row)
+    try:
+        counters = await read_counters(redis_client)
+    except Exception as e:
+        logger.warning(f"Reading stats counters failed: {e}")
+        counters = None
+    if counters:
+        stats.update(counters)
 
-    # By source
-    source_rows = (
-        await db.execute(
-            select(Property.source, func.count())
-            .where(Property.status == "active")
-            .group_by(Property.source)
-        )
-    ).all()
-    by_source = {row[0]: row[1] for row in source_rows}
-
-    # By property type
-    type_rows = (
-        await db.execute(
-            select(Property.property_type, func.count())
-            .where(Property.status == "active", Property.property_type.isnot(None))
-            .group_by(Property.property_type)
-        )
-    ).all()
-    by_type = {row[0]: row[1] for row in type_rows}
-
-    # By transaction type
-    trans_rows = (
-        await db.execute(
-            select(Property.transaction_type, func.count())
-            .where(Property.status == "active", Property.transaction_type.isnot(None))
-            .group_by(Property.transaction_type)
-        )
-    ).all()
-    by_transaction = {row[0]: row[1] for row in trans_rows}
-
-    return StatsResponse(
-        total_active=total_active,
-        new_today=new_today,
-        price_drops_today=price_drops_today,
-        removed_today=removed_today,
-        by_source=by_source,
-        by_type=by_type,
-        by_transaction=by_transaction,
-    )
+    return StatsResponse(**stats)
 
 
 @router.get("/scrape-runs")
+@cached("scrape-runs", until_midnight_or_next_scrape)
 async def get_scrape_runs(limit: int = 20, db: AsyncSession = Depends(get_db)):
     """Return recent scrape run history."""
-    query = (
-        select(ScrapeRun)
-        .order_by(ScrapeRun.started_at.desc())
-        .limit(limit)
-    )
-    result = await db.execute(query)
-    runs = result.scalars().all()
-
-    return [
-        {
-            "id": r.id,
-            "source": r.source,
-            "started_at": r.started_at.isoformat() if r.started_at else None,
-            "finished_at": r.finished_at.isoformat() if r.finished_at else None,
-            "listings_found": r.listings_found,
-            "listings_new": r.listings_new,
-            "listings_updated": r.listings_updated,
-            "status": r.status,
-        }
-        for r in runs
-    ]
+    body = (await db.execute(SCRAPE_RUNS_QUERY, {"limit": limit})).scalar_one()
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/cities")
+@cached("cities", until_midnight_or_next_scrape)
 async def get_cities(db: AsyncSession = Depends(get_db)):
     """Return list of base cities (Praha, Brno, ...) with listing counts."""
-    query = (
-        select(Property.city, func.count().label("cnt"))
-        .where(Property.status == "active", Property.city.isnot(None), Property.city != "")
-        .group_by(Property.city)
-    )
-    rows = (await db.execute(query)).all()
-
-    # Group street-level city strings into base cities
-    city_counts: dict[str, int] = {}
-    for city_str, cnt in rows:
-        base = get_base_city(city_str)
-        city_counts[base] = city_counts.get(base, 0) + cnt
-
-    sorted_cities = sorted(city_counts.items(), key=lambda x: -x[1])[:50]
+    rows = (await db.execute(CITIES_QUERY)).all()
     return [
         {"city": base, "label": get_city_display_name(base), "count": cnt}
-        for base, cnt in sorted_cities
+        for base, cnt in rows
     ]
 
 
@@ -183,6 +115,11 @@ def _escape_like(value: str) -> str:
     return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
+async def _fetch_all(query) -> list:
+    async with async_session() as session:
+        return (await session.execute(query)).all()
+
+
 async def _compute_avg_prices(
     db: AsyncSession,
     base_where: list,
@@ -194,78 +131,74 @@ async def _compute_avg_prices(
 
     Returns {city_string: entry_dict}.
     """
-    price_per_m2_expr = Property.price / Property.size_m2
-
-    # Q1: KÚ-level averages
-    ku_avg_q = (
-        select(
-            Property.ku_kod,
-            func.min(Property.ku_nazev).label("ku_nazev"),
-            func.round(func.avg(price_per_m2_expr), 0).label("avg_price_m2"),
-            func.count().label("sample_count"),
-        )
-        .where(*base_where, Property.ku_kod.isnot(None))
-        .group_by(Property.ku_kod)
-        .having(func.count() >= 2)
+    ku_missing = Property.ku_kod.is_(None)
+
+    # Q1/Q2/Q4/Q5 in one scan via GROUPING SETS. GROUPING(ku_kod, city,
+    # ku_missing, disposition) tells the levels apart (bit set = not grouped):
+    #   7 = per KÚ, 9 = per city without KÚ,
+    #   6 = per KÚ x disposition, 8 = per city without KÚ x disposition
+    grouping_sets = [
+        tuple_(Property.ku_kod),
+        tuple_(Property.city, ku_missing),
+    ]
+    dispositions = (
+        [d.strip() for d in disposition.split(",") if d.strip()] if disposition else []
     )
-    ku_avg = {r.ku_kod: r for r in (await db.execute(ku_avg_q)).all()}
-
-    ku_name_lookup: dict[str, int] = {}
-    for kk, kr in ku_avg.items():
-        if kr.ku_nazev:
-            ku_name_lookup[normalize_city(kr.ku_nazev)] = kk
-
-    # Q2: City-level averages (non-Prague / no KÚ)
-    city_avg_q = (
+    if dispositions:
+        grouping_sets += [
+            tuple_(Property.ku_kod, Property.disposition),
+            tuple_(Property.city, ku_missing, Property.disposition),
+        ]
+    agg_q = (
         select(
+            func.grouping(Property.ku_kod, Property.city, ku_missing, Property.disposition).label("level"),
+            Property.ku_kod,
             Property.city,
-            func.round(func.avg(price_per_m2_expr), 0).label("avg_price_m2"),
+            ku_missing.label("ku_missing"),
+            Property.disposition,
+            func.round(func.avg(Property.price_m2), 0).label("avg_price_m2"),
             func.count().label("sample_count"),
         )
-        .where(*base_where, Property.ku_kod.is_(None))
-        .group_by(Property.city)
+        .where(*base_where)
+        .group_by(func.grouping_sets(*grouping_sets))
         .having(func.count() >= 2)
     )
-    city_avg = {r.city: r for r in (await db.execute(city_avg_q)).all()}
 
     # Q3: All distinct (city, ku_kod) pairs
     pairs_q = select(Property.city, Property.ku_kod).where(*base_where).distinct()
-    all_pairs = (await db.execute(pairs_q)).all()
 
-    # Q4/Q5: Disposition averages (optional)
+    # The two queries are independent: run them concurrently, each on its own
+    # pooled connection (a session can only execute one statement at a time)
+    async with asyncio.TaskGroup() as tg:
+        agg_task = tg.create_task(_fetch_all(agg_q))
+        pairs_task = tg.create_task(_fetch_all(pairs_q))
+    all_pairs = pairs_task.result()
+
+    ku_avg: dict[int, Row] = {}
+    city_avg: dict[str, Row] = {}
     disp_ku: dict[str, dict] = {}
     disp_city: dict[str, dict] = {}
-    if disposition:
-        dispositions = [d.strip() for d in disposition.split(",") if d.strip()]
-        if dispositions:
-            q4 = (
-                select(
-                    Property.ku_kod, Property.disposition,
-                    func.round(func.avg(price_per_m2_expr), 0).label("avg"),
-                    func.count().label("cnt"),
-                )
-                .where(*base_where, Property.ku_kod.isnot(None), Property.disposition.in_(dispositions))
-                .group_by(Property.ku_kod, Property.disposition)
-                .having(func.count() >= 2)
-            )
-            for r in (await db.execute(q4)).all():
-                disp_ku[f"{r.ku_kod}|{r.disposition}"] = {
-                    "avg_price_m2": float(r.avg), "count": r.cnt,
-                }
-            q5 = (
-                select(
-                    Property.city, Property.disposition,
-                    func.round(func.avg(price_per_m2_expr), 0).label("avg"),
-                    func.count().label("cnt"),
-                )
-                .where(*base_where, Property.ku_kod.is_(None), Property.disposition.in_(dispositions))
-                .group_by(Property.city, Property.disposition)
-                .having(func.count() >= 2)
-            )
-            for r in (await db.execute(q5)).all():
-                disp_city[f"{r.city}|{r.disposition}"] = {
-                    "avg_price_m2": float(r.avg), "count": r.cnt,
-                }
+    wanted = set(dispositions)
+    for r in agg_task.result():
+        if r.level == 7 and r.ku_kod is not None:
+            ku_avg[r.ku_kod] = r
+        elif r.level == 9 and r.ku_missing:
+            city_avg[r.city] = r
+        elif r.level == 6 and r.ku_kod is not None and r.disposition in wanted:
+            disp_ku[f"{r.ku_kod}|{r.disposition}"] = {
+                "avg_price_m2": float(r.avg_price_m2), "count": r.sample_count,
+            }
+        elif r.level == 8 and r.ku_missing and r.disposition in wanted:
+            disp_city[f"{r.city}|{r.disposition}"] = {
+                "avg_price_m2": float(r.avg_price_m2), "count": r.sample_count,
+            }
+
+    ku_names = (
+        await db.execute(
+            select(PragueKU.ku_kod, PragueKU.ku_nazev).where(PragueKU.ku_kod.in_(ku_avg))
+        )
+    ).all() if ku_avg else []
+    ku_name_lookup: dict[str, int] = {normalize_city(nazev): kod for kod, nazev in ku_names}
 
     def _match_ku(city_str: str) -> int | None:
         norm = normalize_city(city_str)
@@ -281,7 +214,10 @@ async def _compute_avg_prices(
         return None
 
     result: dict[str, dict] = {}
-    ref_cache: dict[int | str, tuple[float | None, str | None]] = {}
+    ref_prices = await get_reference_prices_bulk(
+        db, list({city_name for city_name, _ in all_pairs}),
+        transaction_type=txn, property_type=property_type,
+    )
 
     for city_name, ku_kod in all_pairs:
         if city_name in result:
@@ -299,25 +235,18 @@ async def _compute_avg_prices(
             entry["avg_price_m2"] = float(d.avg_price_m2)
             entry["count"] = d.sample_count
 
-        cache_key = eff_ku or city_name
-        if cache_key not in ref_cache:
-            ref_cache[cache_key] = await get_reference_price_async(
-                session=db, city=city_name, transaction_type=txn,
-                property_type=property_type,
-            )
-        ref_price, ref_label = ref_cache[cache_key]
+        ref_price, ref_label = ref_prices[city_name]
         if ref_price:
             entry["czso_price_m2"] = ref_price
             entry["czso_region"] = ref_label
 
-        if disposition:
-            for d in [x.strip() for x in disposition.split(",") if x.strip()]:
-                if eff_ku and f"{eff_ku}|{d}" in disp_ku:
-                    entry["by_disposition"] = disp_ku[f"{eff_ku}|{d}"]
-                    break
-                if f"{city_name}|{d}" in disp_city:
-                    entry["by_disposition"] = disp_city[f"{city_name}|{d}"]
-                    break
+        for d in dispositions:
+            if eff_ku and f"{eff_ku}|{d}" in disp_ku:
+                entry["by_disposition"] = disp_ku[f"{eff_ku}|{d}"]
+                break
+            if f"{city_name}|{d}" in disp_city:
+                entry["by_disposition"] = disp_city[f"{city_name}|{d}"]
+                break
 
         if entry.get("avg_price_m2") or entry.get("czso_price_m2"):
             result[city_name] = entry
@@ -326,6 +255,7 @@ async def _compute_avg_prices(
 
 
 @router.get("/avg-price-m2")
+@cached("avg-price-m2", fixed_ttl(15 * 60))
 async def get_avg_price_m2(
     city: str | None = None,
     property_type: str | None = None,
@@ -341,8 +271,7 @@ async def get_avg_price_m2(
     """
     base_where = [
         Property.status == "active",
-        Property.price.isnot(None),
-        Property.size_m2 > 0,
+        Property.price_m2.isnot(None),
         Property.city.isnot(None),
         Property.city != "",
         Property.duplicate_of.is_(None),
@@ -10,12 +10,15 @@ from app.schemas import EmailSubscriptionCreate, EmailSubscriptionResponse
 
 router = APIRouter(prefix="/api/subscriptions", tags=["subscriptions"])
 
-EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# RFC 5321 limits: 64-char local part, 254-char address
+MAX_EMAIL_LENGTH = 254
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]{1,252}\.[a-zA-Z]{2,63}')
 
 
 @router.post("", response_model=EmailSubscriptionResponse, status_code=201)
 async def create_subscription(data: EmailSubscriptionCreate, db: AsyncSession = Depends(get_db)):
-    if not EMAIL_RE.match(data.email):
+    email = data.email
+    if len(email) > MAX_EMAIL_LENGTH or "@" not in email or not EMAIL_RE.fullmatch(email):
         raise HTTPException(status_code=400, detail="Invalid email address")
 
     sub = EmailSubscription(
@@ -33,7 +36,6 @@ async def create_subscription(data: EmailSubscriptionCreate, db: AsyncSession =
     )
     db.add(sub)
     await db.commit()
-    await db.refresh(sub)
     return EmailSubscriptionResponse.model_validate(sub)
 
 
@@ -0,0 +1,87 @@
+"""Redis response cache for read-mostly API endpoints."""
+
+import functools
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Bumped after each scrape; every cached entry embeds the version it was
+# computed under, so stale entries are simply never read again (no SCAN/DEL)
+STATS_VERSION_KEY = "stats:ver"
+
+
+def seconds_until_midnight(grace: int = 300) -> int:
+    """Seconds until the next UTC midnight plus a small grace period."""
+    now = datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int((midnight - now).total_seconds()) + grace
+
+
+def until_midnight_or_next_scrape() -> int:
+    """TTL for stats that roll over daily and change with every scrape."""
+    return min(settings.sreality_interval_minutes * 60, seconds_until_midnight())
+
+
+def fixed_ttl(seconds: int) -> Callable[[], int]:
+    return lambda: seconds
+
+
+async def invalidate_stats_cache() -> None:
+    """Retire every cached stats response by bumping the version key."""
+    await redis_client.incr(STATS_VERSION_KEY)
+
+
+def cached(prefix: str, ttl_fn: Callable[[], int]):
+    """Cache a handler's JSON response in Redis, keyed by its query params.
+
+    Dependency-injected sessions are excluded from the key. On a hit the
+    stored bytes are returned as-is, before the handler touches the database.
+    Redis errors fall through to the handler.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            params = {k: v for k, v in kwargs.items() if not isinstance(v, AsyncSession)}
+            params_hash = hashlib.blake2b(
+                orjson.dumps(params, option=orjson.OPT_SORT_KEYS), digest_size=16
+            ).hexdigest()
+
+            cache_key = None
+            try:
+                version = int(await redis_client.get(STATS_VERSION_KEY) or 0)
+                cache_key = f"stats:{version}:{prefix}:{params_hash}"
+                hit = await redis_client.get(cache_key)
+                if hit is not None:
+                    return Response(content=hit, media_type="application/json")
+            except Exception as e:
+                logger.warning(f"Cache read for {prefix} failed: {e}")
+
+            result = await func(**kwargs)
+            if isinstance(result, Response):
+                body = result.body
+            elif isinstance(result, BaseModel):
+                # pydantic-core serializes straight to JSON bytes
+                body = result.__pydantic_serializer__.to_json(result)
+            else:
+                body = orjson.dumps(result)
+
+            if cache_key is not None:
+                try:
+                    await redis_client.setex(cache_key, ttl_fn(), body)
+                except Exception as e:
+                    logger.warning(f"Cache write for {prefix} failed: {e}")
+
+            return Response(content=body, media_type="application/json")
+        return wrapper
+    return decorator
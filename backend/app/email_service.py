@@ -1,8 +1,12 @@
+import asyncio
+import html
 import logging
-import smtplib
+from contextlib import asynccontextmanager
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+import aiosmtplib
+
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -12,45 +16,104 @@ def is_email_configured() -> bool:
     return bool(settings.smtp_host and settings.smtp_user and settings.smtp_password)
 
 
-def send_email(to: str, subject: str, html_body: str) -> bool:
-    """Send an email notification. Returns True on success."""
-    if not is_email_configured():
-        logger.warning("Email not configured, skipping send")
-        return False
-
+def _build_message(to: str, subject: str, html_body: str) -> MIMEMultipart:
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = settings.smtp_from or settings.smtp_user
     msg["To"] = to
     msg.attach(MIMEText(html_body, "html"))
+    return msg
+
+
+class SMTPConnectionPool:
+    """A small pool of logged-in aiosmtplib clients shared by concurrent senders."""
+
+    def __init__(self, size: int = 2):
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: list[aiosmtplib.SMTP] = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=settings.smtp_host,
+            port=settings.smtp_port,
+            start_tls=settings.smtp_use_tls,
+        )
+        await client.connect()
+        await client.login(settings.smtp_user, settings.smtp_password)
+        return client
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._semaphore:
+            client = None
+            while self._idle and client is None:
+                candidate = self._idle.pop()
+                if candidate.is_connected:
+                    client = candidate
+            if client is None:
+                client = await self._connect()
+            try:
+                yield client
+            except BaseException:
+                client.close()
+                raise
+            if client.is_connected:
+                self._idle.append(client)
+
+    async def close(self) -> None:
+        while self._idle:
+            client = self._idle.pop()
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+async def send_emails_batch(items: list[tuple[str, str, str]]) -> list[bool]:
+    """Send (to, subject, html_body) emails over one pooled SMTP session.
+
+    A failed message is logged and skipped. Returns, per item, whether it
+    was sent.
+    """
+    sent = [False] * len(items)
+    if not is_email_configured():
+        logger.warning("Email not configured, skipping send")
+        return sent
+    if not items:
+        return sent
 
     try:
-        if settings.smtp_use_tls:
-            server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-
-        server.login(settings.smtp_user, settings.smtp_password)
-        server.sendmail(msg["From"], to, msg.as_string())
-        server.quit()
-        logger.info(f"Email sent to {to}: {subject}")
-        return True
+        async with smtp_pool.connection() as client:
+            for i, (to, subject, html_body) in enumerate(items):
+                msg = _build_message(to, subject, html_body)
+                try:
+                    await client.send_message(msg)
+                    sent[i] = True
+                    logger.info(f"Email sent to {to}: {subject}")
+                except (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPResponseException) as e:
+                    logger.error(f"Failed to send email to {to}: {e}")
     except Exception as e:
-        logger.error(f"Failed to send email to {to}: {e}")
-        return False
+        logger.error(f"SMTP session failed after {sum(sent)}/{len(items)} emails: {e}")
 
+    return sent
 
-def build_new_listing_email(properties: list[dict]) -> str:
-    """Build HTML email for new listing notifications."""
-    rows = ""
-    for p in properties:
-        price_str = f"{p['price']:,.0f} CZK" if p.get('price') else "Cena na dotaz"
-        rows += f"""
+
+async def send_email(to: str, subject: str, html_body: str) -> bool:
+    """Send a single email notification. Returns True on success.
+
+    Prefer send_emails_batch when sending to several recipients.
+    """
+    return (await send_emails_batch([(to, subject, html_body)]))[0]
+
+
+_NEW_LISTING_ROW = """
         <tr>
             <td style="padding: 12px; border-bottom: 1px solid #eee;">
-                <a href="{p.get('url', '#')}" style="color: #2563eb; font-weight: 600; text-decoration: none;">{p.get('title', 'Nemovitost')}</a>
-                <br/><span style="color: #666; font-size: 13px;">{p.get('city', '')} | {p.get('disposition', '')} | {p.get('size_m2', '')} m²</span>
+                <a href="{url}" style="color: #2563eb; font-weight: 600; text-decoration: none;">{title}</a>
+                <br/><span style="color: #666; font-size: 13px;">{city} | {disposition} | {size_m2} m²</span>
             </td>
             <td style="padding: 12px; border-bottom: 1px solid #eee; text-align: right; font-weight: 700; color: #2563eb;">
                 {price_str}
@@ -58,35 +121,11 @@ def build_new_listing_email(properties: list[dict]) -> str:
         </tr>
         """
 
-    return f"""
-    <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 600px; margin: 0 auto;">
-        <h2 style="color: #1e3a8a; margin-bottom: 16px;">Nove nemovitosti</h2>
-        <p style="color: #666; margin-bottom: 20px;">Nalezli jsme {len(properties)} novych nemovitosti odpovidajicich vasim filtrum.</p>
-        <table style="width: 100%; border-collapse: collapse; border: 1px solid #eee; border-radius: 8px;">
-            <thead>
-                <tr style="background: #f8fafc;">
-                    <th style="padding: 10px 12px; text-align: left; font-size: 13px; color: #666;">Nemovitost</th>
-                    <th style="padding: 10px 12px; text-align: right; font-size: 13px; color: #666;">Cena</th>
-                </tr>
-            </thead>
-            <tbody>{rows}</tbody>
-        </table>
-        <p style="color: #999; font-size: 12px; margin-top: 20px;">Czech Real Estate Tracker</p>
-    </div>
-    """
-
-
-def build_price_drop_email(properties: list[dict]) -> str:
-    """Build HTML email for price drop notifications."""
-    rows = ""
-    for p in properties:
-        old_price = f"{p['old_price']:,.0f}" if p.get('old_price') else "?"
-        new_price = f"{p['new_price']:,.0f}" if p.get('new_price') else "?"
-        rows += f"""
+_PRICE_DROP_ROW = """
         <tr>
             <td style="padding: 12px; border-bottom: 1px solid #eee;">
-                <a href="{p.get('url', '#')}" style="color: #2563eb; font-weight: 600; text-decoration: none;">{p.get('title', 'Nemovitost')}</a>
-                <br/><span style="color: #666; font-size: 13px;">{p.get('city', '')} | {p.get('disposition', '')}</span>
+                <a href="{url}" style="color: #2563eb; font-weight: 600; text-decoration: none;">{title}</a>
+                <br/><span style="color: #666; font-size: 13px;">{city} | {disposition}</span>
             </td>
             <td style="padding: 12px; border-bottom: 1px solid #eee; text-align: right;">
                 <span style="text-decoration: line-through; color: #999;">{old_price} CZK</span>
@@ -95,10 +134,11 @@ def build_price_drop_email(properties: list[dict]) -> str:
         </tr>
         """
 
-    return f"""
+# Outer layout shared by all notification emails
+_EMAIL_SHELL = """
     <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; max-width: 600px; margin: 0 auto;">
-        <h2 style="color: #16a34a; margin-bottom: 16px;">Pokles cen</h2>
-        <p style="color: #666; margin-bottom: 20px;">U {len(properties)} nemovitosti doslo ke snizeni ceny.</p>
+        <h2 style="color: {heading_color}; margin-bottom: 16px;">{heading}</h2>
+        <p style="color: #666; margin-bottom: 20px;">{intro}</p>
         <table style="width: 100%; border-collapse: collapse; border: 1px solid #eee; border-radius: 8px;">
             <thead>
                 <tr style="background: #f8fafc;">
@@ -111,3 +151,49 @@ def build_price_drop_email(properties: list[dict]) -> str:
         <p style="color: #999; font-size: 12px; margin-top: 20px;">Czech Real Estate Tracker</p>
     </div>
     """
+
+
+def _listing_fields(p: dict) -> dict:
+    # Scraped text goes into HTML; missing columns arrive as None
+    return {
+        "url": html.escape(p.get("url") or "#"),
+        "title": html.escape(p.get("title") or "Nemovitost"),
+        "city": html.escape(p.get("city") or ""),
+        "disposition": html.escape(p.get("disposition") or ""),
+    }
+
+
+def build_new_listing_email(properties: list[dict]) -> str:
+    """Build HTML email for new listing notifications."""
+    rows = "".join(
+        _NEW_LISTING_ROW.format_map({
+            **_listing_fields(p),
+            "size_m2": p["size_m2"] if p.get("size_m2") is not None else "?",
+            "price_str": f"{p['price']:,.0f} CZK" if p.get("price") else "Cena na dotaz",
+        })
+        for p in properties
+    )
+    return _EMAIL_SHELL.format_map({
+        "heading_color": "#1e3a8a",
+        "heading": "Nove nemovitosti",
+        "intro": f"Nalezli jsme {len(properties)} novych nemovitosti odpovidajicich vasim filtrum.",
+        "rows": rows,
+    })
+
+
+def build_price_drop_email(properties: list[dict]) -> str:
+    """Build HTML email for price drop notifications."""
+    rows = "".join(
+        _PRICE_DROP_ROW.format_map({
+            **_listing_fields(p),
+            "old_price": f"{p['old_price']:,.0f}" if p.get("old_price") else "?",
+            "new_price": f"{p['new_price']:,.0f}" if p.get("new_price") else "?",
+        })
+        for p in properties
+    )
+    return _EMAIL_SHELL.format_map({
+        "heading_color": "#16a34a",
+        "heading": "Pokles cen",
+        "intro": f"U {len(properties)} nemovitosti doslo ke snizeni ceny.",
+        "rows": rows,
+    })
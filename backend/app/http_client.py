@@ -0,0 +1,8 @@
+import httpx
+
+# Shared outbound HTTP client: keeps TLS connections alive between requests
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=15.0,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+)
@@ -2,21 +2,24 @@ import asyncio
 import logging
 from contextlib import asynccontextmanager
 
-import redis.asyncio as aioredis
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
 
 from app.api.properties import router as properties_router
 from app.api.stats import router as stats_router
 from app.api.filters import router as filters_router
 from app.api.favorites import router as favorites_router
 from app.api.export import router as export_router
-from app.api.events import router as events_router
+from app.api.events import router as events_router, pubsub_fanout
 from app.api.images import router as images_router
 from app.api.subscriptions import router as subscriptions_router
-from app.config import settings
 from app.database import engine
-from app.middleware import RateLimitMiddleware
+from app.email_service import smtp_pool
+from app.http_client import http_client
+from app.middleware import RateLimitMiddleware, clock_upkeep
+from app.redis import redis_client
 from scrapers.scheduler import setup_scheduler, run_initial_scrape
 
 logging.basicConfig(
@@ -37,8 +40,17 @@ async def lifespan(app: FastAPI):
     task = asyncio.create_task(run_initial_scrape())
     _background_tasks.add(task)
     task.add_done_callback(_background_tasks.discard)
+    # Single Redis pubsub subscriber shared by all SSE clients
+    fanout_task = asyncio.create_task(pubsub_fanout())
+    # Cached wall clock read by the rate limiter
+    clock_task = asyncio.create_task(clock_upkeep())
     yield
     logger.info("Shutting down...")
+    fanout_task.cancel()
+    clock_task.cancel()
+    await redis_client.aclose()
+    await http_client.aclose()
+    await smtp_pool.close()
 
 
 app = FastAPI(
@@ -46,6 +58,7 @@ app = FastAPI(
     description="API for tracking Czech real estate listings from Sreality, Bezrealitky, and iDNES",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(RateLimitMiddleware, requests_per_minute=120)
@@ -67,31 +80,29 @@ app.include_router(images_router)
 app.include_router(subscriptions_router)
 
 
+HEALTH_QUERY = text("SELECT 1")
+
+
+async def _check_database() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(HEALTH_QUERY)
+
+
 @app.get("/api/health")
 async def health():
     status = {"status": "ok", "service": "reality-tracker"}
     checks = {}
 
-    # Check database
-    try:
-        async with engine.connect() as conn:
-            await conn.execute(
-                __import__("sqlalchemy").text("SELECT 1")
-            )
-        checks["database"] = "ok"
-    except Exception as e:
-        checks["database"] = f"error: {e}"
-        status["status"] = "degraded"
-
-    # Check Redis
-    try:
-        r = aioredis.from_url(settings.redis_url)
-        await r.ping()
-        await r.aclose()
-        checks["redis"] = "ok"
-    except Exception as e:
-        checks["redis"] = f"error: {e}"
-        status["status"] = "degraded"
+    # Database and Redis are checked concurrently
+    db_result, redis_result = await asyncio.gather(
+        _check_database(), redis_client.ping(), return_exceptions=True
+    )
+    for name, result in (("database", db_result), ("redis", redis_result)):
+        if isinstance(result, Exception):
+            checks[name] = f"error: {result}"
+            status["status"] = "degraded"
+        else:
+            checks[name] = "ok"
 
     status["checks"] = checks
     return status
@@ -1,49 +1,192 @@
+import asyncio
+import logging
 import time
-from collections import defaultdict
+from array import array
 
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import Response
+
+from app.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Paths served without rate limiting
+DEFAULT_BYPASS_PATHS = frozenset({"/api/health", "/docs", "/redoc", "/openapi.json"})
+
+THROTTLED_BODY = b'{"detail":"Too many requests. Please try again later."}'
+
+# Wall clock refreshed by clock_upkeep(); the 60 s window tolerates the drift
+CLOCK_TICK = 0.05  # seconds
+_cached_now: float = time.time()
+
+# Sliding-window counter: the previous window's count is weighted by how much
+# of it still overlaps the sliding window. Check and increment are atomic, so
+# the limit holds across all uvicorn workers.
+SLIDING_WINDOW_LUA = """
+local cur = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local weighted_prev = prev * (window_ms - tonumber(ARGV[3])) / window_ms
+if cur + weighted_prev >= limit then
+    return {0, 0}
+end
+cur = redis.call('INCR', KEYS[1])
+if cur == 1 then
+    redis.call('PEXPIRE', KEYS[1], window_ms * 2)
+end
+return {1, math.floor(limit - cur - weighted_prev)}
+"""
+
+sliding_window = redis_client.register_script(SLIDING_WINDOW_LUA)
+
+# Redis-down fallback: fixed-window counters in one packed uint32 array,
+# (minute bucket << FALLBACK_COUNT_BITS) | count, indexed by hash(ip). Hash
+# collisions only make limiting stricter for the colliding clients.
+FALLBACK_SLOTS = 1 << 18  # must be a power of two
+FALLBACK_COUNT_BITS = 20
+FALLBACK_COUNT_MASK = (1 << FALLBACK_COUNT_BITS) - 1
+FALLBACK_BUCKET_MASK = (1 << (32 - FALLBACK_COUNT_BITS)) - 1
+
+# Counting Bloom filter sizing for the per-worker fast path
+SKETCH_SIZE = 1 << 14  # cells, must be a power of two
+SKETCH_HASHES = 4
+# Clients this worker has seen fewer times than limit // FAST_PATH_DIVISOR in
+# the current minute are admitted without a Redis round trip
+FAST_PATH_DIVISOR = 8
+
+
+class CountingBloomFilter:
+    """Fixed-size counting Bloom filter; estimates never undercount."""
+
+    def __init__(self, size: int = SKETCH_SIZE, hashes: int = SKETCH_HASHES):
+        self._cells = array("I", bytes(4 * size))
+        self._mask = size - 1
+        self._shift = self._mask.bit_length()
+        self._hashes = hashes
+
+    def _indexes(self, key: str) -> list[int]:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return [(h >> (i * self._shift)) & self._mask for i in range(self._hashes)]
+
+    def add(self, key: str) -> int:
+        """Count one occurrence of key and return its new estimated count."""
+        cells = self._cells
+        estimate = None
+        for i in self._indexes(key):
+            cells[i] += 1
+            if estimate is None or cells[i] < estimate:
+                estimate = cells[i]
+        return estimate
+
+    def clear(self):
+        self._cells = array("I", bytes(4 * len(self._cells)))
+
+
+async def clock_upkeep():
+    """Refresh the cached clock every CLOCK_TICK seconds."""
+    global _cached_now
+    while True:
+        _cached_now = time.time()
+        await asyncio.sleep(CLOCK_TICK)
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory rate limiter. For production, use Redis-based solution."""
+    """Rate limiter backed by a Redis sliding-window counter shared by all workers.
+
+    Light clients are admitted from a per-worker counting Bloom filter that
+    resets every window; only clients approaching the limit reach Redis. The
+    fast path lets each worker admit up to limit // FAST_PATH_DIVISOR requests
+    per client uncounted by Redis, which is the accepted slack.
 
-    def __init__(self, app, requests_per_minute: int = 120):
+    When Redis is unreachable it falls back to in-process per-minute counters,
+    so the API keeps limiting (per worker) instead of failing open.
+    """
+
+    def __init__(
+        self,
+        app,
+        requests_per_minute: int = 120,
+        bypass_paths: frozenset[str] = DEFAULT_BYPASS_PATHS,
+    ):
         super().__init__(app)
         self.requests_per_minute = requests_per_minute
+        self._bypass = frozenset(bypass_paths)
         self.window = 60  # seconds
-        self._hits: dict[str, list[float]] = defaultdict(list)
+        self._window_ms = self.window * 1000
+        self._slots = array("I", bytes(4 * FALLBACK_SLOTS))
+        self._sketch = CountingBloomFilter()
+        self._sketch_bucket = int(_cached_now // self.window)
+        self._fast_path_limit = requests_per_minute // FAST_PATH_DIVISOR
+        self._limit_header = str(requests_per_minute).encode()
+        self._retry_after = str(self.window)
 
     def _get_client_ip(self, request: Request) -> str:
         forwarded = request.headers.get("x-forwarded-for")
         if forwarded:
-            return forwarded.split(",")[0].strip()
+            # First hop only; find() avoids building the full split list
+            comma = forwarded.find(",")
+            return (forwarded[:comma] if comma >= 0 else forwarded).strip()
         return request.client.host if request.client else "unknown"
 
+    async def _redis_allow(self, client_ip: str, now: float) -> tuple[bool, int]:
+        bucket = int(now // self.window)
+        elapsed_ms = int((now - bucket * self.window) * 1000)
+        allowed, remaining = await sliding_window(
+            keys=[f"ratelimit:{client_ip}:{bucket}", f"ratelimit:{client_ip}:{bucket - 1}"],
+            args=[self.requests_per_minute, self._window_ms, elapsed_ms],
+        )
+        return bool(allowed), int(remaining)
+
+    def _local_allow(self, client_ip: str, now: float) -> tuple[bool, int]:
+        slot = hash(client_ip) & (FALLBACK_SLOTS - 1)
+        bucket = int(now // self.window) & FALLBACK_BUCKET_MASK
+        packed = self._slots[slot]
+        count = packed & FALLBACK_COUNT_MASK if packed >> FALLBACK_COUNT_BITS == bucket else 0
+
+        if count >= self.requests_per_minute:
+            return False, 0
+        count += 1
+        self._slots[slot] = (bucket << FALLBACK_COUNT_BITS) | count
+        return True, self.requests_per_minute - count
+
     async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for health check
-        if request.url.path == "/api/health":
+        # Skip rate limiting for health check and API docs
+        if request.scope["path"] in self._bypass:
             return await call_next(request)
 
         client_ip = self._get_client_ip(request)
-        now = time.time()
-        cutoff = now - self.window
+        now = _cached_now
+
+        bucket = int(now // self.window)
+        if bucket != self._sketch_bucket:
+            self._sketch.clear()
+            self._sketch_bucket = bucket
+        seen = self._sketch.add(client_ip)
 
-        # Clean old entries
-        self._hits[client_ip] = [t for t in self._hits[client_ip] if t > cutoff]
+        if seen <= self._fast_path_limit:
+            allowed, remaining = True, self.requests_per_minute - seen
+        else:
+            try:
+                allowed, remaining = await self._redis_allow(client_ip, now)
+            except Exception as e:
+                logger.warning(f"Redis rate limiter unavailable, using local fallback: {e}")
+                allowed, remaining = self._local_allow(client_ip, now)
 
-        if len(self._hits[client_ip]) >= self.requests_per_minute:
-            return JSONResponse(
+        if not allowed:
+            return Response(
+                content=THROTTLED_BODY,
                 status_code=429,
-                content={"detail": "Too many requests. Please try again later."},
-                headers={"Retry-After": str(self.window)},
+                media_type="application/json",
+                headers={"Retry-After": self._retry_after},
             )
 
-        self._hits[client_ip].append(now)
         response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
-        response.headers["X-RateLimit-Remaining"] = str(
-            self.requests_per_minute - len(self._hits[client_ip])
+        # Appended straight to the raw list: nothing upstream sets these, so
+        # MutableHeaders' scan-and-replace is unnecessary
+        response.raw_headers += (
+            (b"x-ratelimit-limit", self._limit_header),
+            (b"x-ratelimit-remaining", str(remaining).encode()),
         )
         return response
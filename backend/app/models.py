@@ -1,14 +1,20 @@
-from datetime import datetime
+from datetime import date, datetime, timezone
+
+import msgpack
 
 from sqlalchemy import (
     BigInteger,
     Boolean,
     Column,
+    Computed,
+    Date,
     DateTime,
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     Numeric,
+    SmallInteger,
     String,
     Text,
     UniqueConstraint,
@@ -18,10 +24,30 @@ from geoalchemy2 import Geometry
 from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 
 from app.database import Base
 
 
+def _utcnow() -> datetime:
+    # Bound client-side so ORM inserts need no RETURNING/refresh for
+    # timestamps; server_default still covers raw SQL and trigger inserts
+    return datetime.now(timezone.utc)
+
+
+class MsgPack(TypeDecorator):
+    """Python object stored as MessagePack bytes, for payloads never queried in SQL."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return msgpack.packb(value, use_bin_type=True) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return msgpack.unpackb(value, raw=False) if value is not None else None
+
+
 class Property(Base):
     __tablename__ = "properties"
 
@@ -30,41 +56,69 @@ class Property(Base):
     external_id: Mapped[str] = mapped_column(String(100), nullable=False)
     url: Mapped[str | None] = mapped_column(Text)
     title: Mapped[str | None] = mapped_column(Text)
-    description: Mapped[str | None] = mapped_column(Text)
+    description: Mapped[str | None] = mapped_column(Text, deferred=True, deferred_group="detail")
     property_type: Mapped[str | None] = mapped_column(String(30))
     transaction_type: Mapped[str | None] = mapped_column(String(20))
     disposition: Mapped[str | None] = mapped_column(String(20))
     price: Mapped[float | None] = mapped_column(Numeric(14, 2))
     price_currency: Mapped[str] = mapped_column(String(10), default="CZK")
     size_m2: Mapped[float | None] = mapped_column(Numeric(10, 2))
-    rooms: Mapped[int | None] = mapped_column(Integer)
+    price_m2: Mapped[float | None] = mapped_column(
+        Numeric(14, 2),
+        Computed("CASE WHEN size_m2 > 0 THEN price / size_m2 END", persisted=True),
+    )
+    rooms: Mapped[int | None] = mapped_column(SmallInteger)
     latitude: Mapped[float | None] = mapped_column(Float)
     longitude: Mapped[float | None] = mapped_column(Float)
+    geom = mapped_column(
+        Geometry("POINT", srid=4326),
+        Computed("ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)", persisted=True),
+        deferred=True,
+    )
     ku_kod: Mapped[int | None] = mapped_column(Integer)
-    ku_nazev: Mapped[str | None] = mapped_column(String(200))
     city: Mapped[str | None] = mapped_column(String(200))
+    base_city: Mapped[str | None] = mapped_column(
+        String(200), Computed("base_city(city)", persisted=True)
+    )
     district: Mapped[str | None] = mapped_column(String(200))
     address: Mapped[str | None] = mapped_column(Text)
-    images: Mapped[dict] = mapped_column(JSONB, default=list)
-    raw_data: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Heavy columns are only loaded when asked for: list endpoints name their
+    # columns via load_only, the detail view undefers the "detail" group
+    images: Mapped[dict] = mapped_column(
+        JSONB, default=list, deferred=True, deferred_group="detail"
+    )
+    raw_data: Mapped[dict] = mapped_column(
+        MsgPack, default=dict, deferred=True, deferred_group="detail"
+    )
     status: Mapped[str] = mapped_column(String(20), default="active")
     duplicate_of: Mapped[int | None] = mapped_column(
         BigInteger, ForeignKey("properties.id", ondelete="SET NULL")
     )
-    missed_runs: Mapped[int] = mapped_column(Integer, default=0)
+    missed_runs: Mapped[int] = mapped_column(SmallInteger, default=0)
     first_seen_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
     last_seen_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
+    )
+    search_vector = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', COALESCE(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(city, '')), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(district, '')), 'B') || "
+            "setweight(to_tsvector('simple', COALESCE(address, '')), 'B') || "
+            "setweight(to_tsvector('simple', COALESCE(description, '')), 'C')",
+            persisted=True,
+        ),
+        deferred=True,
     )
-    search_vector = Column(TSVECTOR)
 
     price_history: Mapped[list["PriceHistory"]] = relationship(
         back_populates="property", cascade="all, delete-orphan"
@@ -80,6 +134,7 @@ class Property(Base):
 
 class PriceHistory(Base):
     __tablename__ = "price_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (recorded_at)"}
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     property_id: Mapped[int] = mapped_column(
@@ -88,12 +143,24 @@ class PriceHistory(Base):
     price: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False)
     price_per_m2: Mapped[float | None] = mapped_column(Numeric(14, 2))
     recorded_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), primary_key=True, default=_utcnow, server_default=func.now()
     )
 
     property: Mapped["Property"] = relationship(back_populates="price_history")
 
 
+class PropertyLastPrice(Base):
+    """Each property's last recorded price before snapshot_date (UTC)."""
+
+    __tablename__ = "property_last_price"
+
+    property_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("properties.id", ondelete="CASCADE"), primary_key=True
+    )
+    price: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False)
+    snapshot_date: Mapped[date] = mapped_column(Date, nullable=False)
+
+
 class UserFilter(Base):
     __tablename__ = "user_filters"
 
@@ -114,7 +181,7 @@ class UserFilter(Base):
     price_drop_threshold: Mapped[float] = mapped_column(Numeric(5, 2), default=5.0)
     active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
 
     notifications: Mapped[list["Notification"]] = relationship(
@@ -134,7 +201,7 @@ class Notification(Base):
     )
     notification_type: Mapped[str] = mapped_column(String(30), nullable=False)
     sent_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
 
     user_filter: Mapped["UserFilter"] = relationship(back_populates="notifications")
@@ -146,7 +213,7 @@ class ScrapeRun(Base):
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     source: Mapped[str] = mapped_column(String(50), nullable=False)
     started_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
     finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     listings_found: Mapped[int] = mapped_column(Integer, default=0)
@@ -164,12 +231,13 @@ class Favorite(Base):
         BigInteger, ForeignKey("properties.id", ondelete="CASCADE"), nullable=False
     )
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
 
     property: Mapped["Property"] = relationship(back_populates="favorites")
 
     __table_args__ = (
+        # Created with INCLUDE (id, created_at) in the schema (migration 023)
         UniqueConstraint("session_id", "property_id", name="uq_favorite"),
     )
 
@@ -191,10 +259,30 @@ class EmailSubscription(Base):
     notify_price_drop: Mapped[bool] = mapped_column(Boolean, default=True)
     active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
 
 
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        UniqueConstraint("subscription_id", "property_id", "kind", name="uq_email_outbox"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    subscription_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("email_subscriptions.id", ondelete="CASCADE"), nullable=False
+    )
+    property_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("properties.id", ondelete="CASCADE"), nullable=False
+    )
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
+    )
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
 class PragueKU(Base):
     __tablename__ = "prague_ku"
 
@@ -210,13 +298,21 @@ class KuPriceStats(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     ku_kod: Mapped[int] = mapped_column(Integer, nullable=False)
     ku_nazev: Mapped[str] = mapped_column(String(200), nullable=False)
+    ku_nazev_normalized: Mapped[str | None] = mapped_column(
+        String(200),
+        Computed(
+            "replace(translate(lower(trim(ku_nazev)), "
+            "'áäčďéěíĺľňóôöŕřšťúůüýž', 'aacdeeillnooorrstuuuyz'), ' ', '-')",
+            persisted=True,
+        ),
+    )
     property_type: Mapped[str | None] = mapped_column(String(30))
     transaction_type: Mapped[str] = mapped_column(String(20), nullable=False)
     median_price_m2: Mapped[float | None] = mapped_column(Numeric(14, 2))
     avg_price_m2: Mapped[float | None] = mapped_column(Numeric(14, 2))
     sample_count: Mapped[int] = mapped_column(Integer, default=0)
     computed_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
 
     __table_args__ = (
@@ -236,7 +332,7 @@ class ReferenceBenchmark(Base):
     price_m2: Mapped[float | None] = mapped_column(Numeric(14, 2))
     period: Mapped[str | None] = mapped_column(String(20))
     fetched_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        DateTime(timezone=True), default=_utcnow, server_default=func.now()
     )
 
     __table_args__ = (
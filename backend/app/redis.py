@@ -0,0 +1,11 @@
+import redis.asyncio as aioredis
+
+from app.config import settings
+
+# Shared connection pool; the client is safe for concurrent use across requests.
+# When all connections are busy, callers wait up to timeout seconds for one
+# instead of failing with "Too many connections".
+redis_pool = aioredis.BlockingConnectionPool.from_url(
+    settings.redis_url, max_connections=50, timeout=5
+)
+redis_client = aioredis.Redis.from_pool(redis_pool)
@@ -9,6 +9,11 @@ Sources:
 Used as external reference for price comparison.
 """
 
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
 # Average apartment prices per m2 by region (kraj), CZK, prodej (sale)
 CZSO_PRICES_PRODEJ: dict[str, int] = {
     "Praha": 140_000,  # city-wide average, overridden by district data below
@@ -198,13 +203,14 @@ CITY_TO_REGION: dict[str, str] = {
 }
 
 
+@lru_cache(maxsize=8192)
 def normalize_city(city: str) -> str:
     """Normalize city name for lookup: lowercase, strip, replace spaces with dashes."""
-    import unicodedata
     # Remove diacritics for matching
     nfkd = unicodedata.normalize("NFKD", city.lower().strip())
     ascii_str = "".join(c for c in nfkd if not unicodedata.combining(c))
-    return ascii_str.replace(" ", "-")
+    # Interned: results are reused as dict keys across the lookup helpers
+    return sys.intern(ascii_str.replace(" ", "-"))
 
 
 # Display-friendly names for base cities (Czech with diacritics)
@@ -242,23 +248,42 @@ CITY_DISPLAY_NAMES: dict[str, str] = {
     "trebic": "Třebíč",
 }
 
-# Pre-sorted keys (longest first) for prefix matching
-_CITY_KEYS_BY_LEN = sorted(CITY_TO_REGION.keys(), key=len, reverse=True)
-
-
+# Trie over the dash-separated segments of the CITY_TO_REGION keys; the
+# deepest key on a city's segment path is its base city
+_TRIE_KEY = "-"  # can never be a segment, since names are split on it
+_CITY_TRIE: dict = {}
+for _key in CITY_TO_REGION:
+    _node = _CITY_TRIE
+    for _segment in _key.split("-"):
+        _node = _node.setdefault(_segment, {})
+    _node[_TRIE_KEY] = _key
+del _key, _node, _segment
+
+
+def _match_city_key(segments: list[str]) -> str | None:
+    """Deepest CITY_TO_REGION key that the segment list starts with."""
+    key = None
+    node = _CITY_TRIE
+    for segment in segments:
+        node = node.get(segment)
+        if node is None:
+            break
+        key = node.get(_TRIE_KEY, key)
+    return key
+
+
+@lru_cache(maxsize=8192)
 def get_base_city(city_str: str) -> str:
     """Extract the base city name from a full city string.
 
     E.g. 'praha-karlin-krizikova' → 'praha'
          'ceske-budejovice-ceske-budejovice-6' → 'ceske-budejovice'
     """
-    norm = normalize_city(city_str)
-    for key in _CITY_KEYS_BY_LEN:
-        if norm == key or norm.startswith(key + "-"):
-            return key
-    return norm.split("-")[0] if "-" in norm else norm
+    segments = normalize_city(city_str).split("-")
+    return _match_city_key(segments) or segments[0]
 
 
+@lru_cache(maxsize=1024)
 def get_city_display_name(base_city: str) -> str:
     """Get a display-friendly name for a base city."""
     if base_city in CITY_DISPLAY_NAMES:
@@ -266,56 +291,65 @@ def get_city_display_name(base_city: str) -> str:
     return base_city.replace("-", " ").title()
 
 
-def _extract_prague_district_number(city: str) -> int | None:
-    """Try to extract a Prague district number from a city string.
+# "praha-5", "praha-10", "praha 5 - nusle" (on normalized city strings)
+_PRAHA_DISTRICT_RE = re.compile(r"praha[\s-]+(\d{1,2})")
+
 
-    Handles patterns like:
-    - "Praha 5"
-    - "Praha 10 - Uhrineves"
-    - "praha-smichov-holeckova"
-    - "praha-vinohrady-namesti..."
+@lru_cache(maxsize=8192)
+def _parse_prague_location(city: str) -> tuple[int | None, str | None]:
+    """Parse a Prague city string into (district number, KÚ name part).
+
+    Both come from one walk over the segments after "praha-":
+    - "praha-5-smichov" -> (5, "smichov")
+    - "praha-branik-ke-krci" -> (4, "branik")
+    - "brno-stred" -> (None, None)
     """
-    import re
     normalized = normalize_city(city)
 
     # Pattern 1: "praha-5", "praha-10", "praha 5 - nusle"
-    m = re.match(r"praha[\s-]+(\d{1,2})", normalized)
-    if m:
-        return int(m.group(1))
+    m = _PRAHA_DISTRICT_RE.match(normalized)
+    district = int(m.group(1)) if m else None
+
+    if not normalized.startswith("praha-"):
+        return district, None
 
     # Pattern 2: "praha-<katastral>-<street>" or "praha-<katastral>"
-    # Remove "praha-" prefix and check the next part against KATASTRAL_TO_DISTRICT
-    if normalized.startswith("praha-"):
-        rest = normalized[6:]  # after "praha-"
-        # Try matching the first part (before next dash) as katastralni uzemi
-        parts = rest.split("-")
-        # Try progressively longer combinations
-        for length in range(1, min(len(parts) + 1, 4)):
+    parts = normalized[6:].split("-")
+    # Skip leading district numbers
+    while parts and parts[0].isdigit():
+        parts = parts[1:]
+    if not parts:
+        return district, None
+    # Try progressively longer combinations against KATASTRAL_TO_DISTRICT;
+    # single-segment names are the common case and need no join
+    candidate = parts[0]
+    if candidate not in KATASTRAL_TO_DISTRICT:
+        for length in range(2, min(len(parts), 3) + 1):
             candidate = "-".join(parts[:length])
             if candidate in KATASTRAL_TO_DISTRICT:
-                return KATASTRAL_TO_DISTRICT[candidate]
+                break
+        else:
+            return district, parts[0] or None
+    if district is None:
+        district = KATASTRAL_TO_DISTRICT[candidate]
+    return district, candidate
 
-    return None
+
+def _extract_prague_district_number(city: str) -> int | None:
+    """Try to extract a Prague district number from a city string."""
+    return _parse_prague_location(city)[0]
 
 
+@lru_cache(maxsize=8192)
 def get_region_for_city(city: str) -> str | None:
     """Find the region (kraj) for a given city name."""
-    normalized = normalize_city(city)
-
-    # Direct match
-    if normalized in CITY_TO_REGION:
-        return CITY_TO_REGION[normalized]
-
-    # Partial match - city name contains a known city key
-    for key, region in CITY_TO_REGION.items():
-        if key in normalized or normalized in key:
-            return region
-
-    # Try matching start of the city name (e.g. "praha-vinohrady" -> "praha")
-    for key, region in CITY_TO_REGION.items():
-        if normalized.startswith(key) or key.startswith(normalized.split("-")[0]):
-            return region
-
+    segments = normalize_city(city).split("-")
+    # Base city first ("praha-vinohrady" -> "praha"), then a known city
+    # starting at any later segment ("hlavni-mesto-praha" -> "praha")
+    for start in range(len(segments)):
+        key = _match_city_key(segments[start:])
+        if key is not None:
+            return CITY_TO_REGION[key]
     return None
 
 
@@ -366,164 +400,150 @@ def get_czso_region_name(city: str) -> str | None:
     return get_reference_label(city)
 
 
+def _mf_ku_candidates(city: str) -> list[str]:
+    """KÚ name candidates for MF rental lookup ("praha-2-vinohrady" -> ["vinohrady"])."""
+    normalized = normalize_city(city)
+    ku_candidates = []
+    if normalized.startswith("praha-"):
+        parts = normalized[6:].split("-")
+        # Skip the district number
+        if parts and parts[0].isdigit():
+            parts = parts[1:]
+        for length in range(1, min(len(parts) + 1, 4)):
+            candidate = "-".join(parts[:length])
+            if candidate and not candidate.isdigit():
+                ku_candidates.append(candidate)
+    return ku_candidates
+
+
 # ---------------------------------------------------------------------------
 # Async reference price chain (uses DB for live benchmarks)
 # Priority for prodej: KÚ median → RealityMix → Deloitte → CZSO
 # Priority for pronajem: MF rental → KÚ median → RealityMix → Deloitte → CZSO
 # ---------------------------------------------------------------------------
 
-async def get_reference_price_async(
+async def get_reference_prices_bulk(
     session,
-    city: str,
+    cities: list[str],
     transaction_type: str = "prodej",
     property_type: str | None = None,
-) -> tuple[float | None, str | None]:
-    """Get the best available reference price per m² and its label.
-
-    Returns (price_m2, label) using a priority fallback chain.
+) -> dict[str, tuple[float | None, str | None]]:
+    """Resolve reference prices for many cities with a fixed number of queries.
 
-    For prodej (sales):
-      1. Own KÚ median from ku_price_stats (best match for this city)
-      2. RealityMix district data from reference_benchmarks
-      3. Static Deloitte district data
-      4. Static CZSO regional data
-
-    For pronajem (rentals) in Prague, MF KÚ-level data is checked first.
+    Uses the priority chain above. The benchmark tables are read once up
+    front and each city is matched in memory. Returns {city: (price_m2, label)}.
     """
     from sqlalchemy import text
 
-    district = _extract_prague_district_number(city)
+    locations = {city: _parse_prague_location(city) for city in cities}
+    prague = [city for city in cities if locations[city][0] is not None]
+
+    mf_rows: list = []
+    ku_rows: list = []
+    city_ku: dict[str, set[int]] = {}
+    realitymix: dict[str, float] = {}
 
-    # --- Layer 1: MF rental data (rentals only, KÚ-level) ---
-    # Try to find MF data matching the KÚ name from the city string
-    if transaction_type == "pronajem" and district is not None:
+    if prague:
         try:
-            # Try to extract KÚ name from city (e.g. "Praha 2 - Vinohrady" -> check "Vinohrady")
-            normalized = normalize_city(city)
-            ku_candidates = []
-            if normalized.startswith("praha-"):
-                rest = normalized[6:]
-                parts = rest.split("-")
-                # Skip the district number
-                if parts and parts[0].isdigit():
-                    parts = parts[1:]
-                for length in range(1, min(len(parts) + 1, 4)):
-                    candidate = "-".join(parts[:length])
-                    if candidate and not candidate.isdigit():
-                        ku_candidates.append(candidate)
-
-            for candidate in ku_candidates:
-                q = text("""
+            if transaction_type == "pronajem":
+                mf_rows = (await session.execute(text("""
                     SELECT price_m2, region
                     FROM reference_benchmarks
-                    WHERE source = 'mf_rental'
-                      AND LOWER(region) LIKE :pattern
-                      AND transaction_type = 'pronajem'
+                    WHERE source = 'mf_rental' AND transaction_type = 'pronajem'
                     ORDER BY fetched_at DESC
-                    LIMIT 1
-                """)
-                row = (await session.execute(q, {"pattern": f"%{candidate}%"})).first()
-                if row and row.price_m2:
-                    return float(row.price_m2), f"{row.region} (MF)"
+                """))).all()
         except Exception:
             pass
 
-    # --- Layer 2: Own KÚ median from ku_price_stats ---
-    # Extract KÚ name from city (e.g. "praha-branik-ke-krci" -> "branik")
-    if district is not None:
         try:
-            normalized = normalize_city(city)
-            ku_part = None
-            if normalized.startswith("praha-"):
-                rest = normalized[6:]
-                parts = rest.split("-")
-                # Skip leading district numbers
-                while parts and parts[0].isdigit():
-                    parts = parts[1:]
-                if parts:
-                    for length in range(1, min(len(parts) + 1, 4)):
-                        candidate = "-".join(parts[:length])
-                        if candidate in KATASTRAL_TO_DISTRICT:
-                            ku_part = candidate
-                            break
-                    if not ku_part and parts[0]:
-                        ku_part = parts[0]
-
             params: dict = {"txn": transaction_type}
             type_clause = ""
             if property_type:
-                type_clause = "AND ks.property_type = :ptype"
+                type_clause = "AND property_type = :ptype"
                 params["ptype"] = property_type
-
-            if ku_part:
-                # Match KÚ name via diacritics-stripped LIKE
-                params["ku_pattern"] = f"%{ku_part}%"
-                q = text(f"""
-                    SELECT ks.median_price_m2, ks.ku_nazev, ks.sample_count
-                    FROM ku_price_stats ks
-                    WHERE ks.transaction_type = :txn
-                      {type_clause}
-                      AND ks.sample_count >= 5
-                      AND LOWER(TRANSLATE(ks.ku_nazev,
-                          'áčďéěíňóřšťúůýžÁČĎÉĚÍŇÓŘŠŤÚŮÝŽ',
-                          'acdeeinorstuuyzACDEEINORSTUUYZ')) LIKE :ku_pattern
-                    ORDER BY ks.sample_count DESC
-                    LIMIT 1
-                """)
-            else:
-                # Fallback: find the most common KÚ for exact city
-                params["city_exact"] = city
-                q = text(f"""
-                    SELECT ks.median_price_m2, ks.ku_nazev, ks.sample_count
-                    FROM ku_price_stats ks
-                    WHERE ks.transaction_type = :txn
-                      {type_clause}
-                      AND ks.sample_count >= 5
-                      AND ks.ku_kod IN (
-                          SELECT p.ku_kod FROM properties p
-                          WHERE p.city = :city_exact AND p.ku_kod IS NOT NULL
-                      )
-                    ORDER BY ks.sample_count DESC
-                    LIMIT 1
-                """)
-
-            row = (await session.execute(q, params)).first()
-            if row and row.median_price_m2:
-                return float(row.median_price_m2), f"{row.ku_nazev} (median, N={row.sample_count})"
+            ku_rows = (await session.execute(text(f"""
+                SELECT ku_kod, ku_nazev, ku_nazev_normalized, median_price_m2, sample_count
+                FROM ku_price_stats
+                WHERE transaction_type = :txn
+                  {type_clause}
+                  AND sample_count >= 5
+                ORDER BY sample_count DESC
+            """), params)).all()
+
+            # Cities without a KÚ name fall back to the KÚ codes of their listings
+            unnamed = [city for city in prague if locations[city][1] is None]
+            if unnamed:
+                pair_rows = (await session.execute(text("""
+                    SELECT DISTINCT city, ku_kod FROM properties
+                    WHERE city = ANY(:cities) AND ku_kod IS NOT NULL
+                """), {"cities": unnamed})).all()
+                for row in pair_rows:
+                    city_ku.setdefault(row.city, set()).add(row.ku_kod)
         except Exception:
             pass
 
-    # --- Layer 3: RealityMix district data ---
-    if district is not None:
         try:
-            region_name = f"Praha {district}"
-            q = text("""
-                SELECT price_m2, region
+            rm_rows = (await session.execute(text("""
+                SELECT DISTINCT ON (region) region, price_m2
                 FROM reference_benchmarks
-                WHERE source = 'realitymix'
-                  AND region = :region
-                  AND transaction_type = :txn
-                ORDER BY fetched_at DESC
-                LIMIT 1
-            """)
-            row = (await session.execute(q, {"region": region_name, "txn": transaction_type})).first()
-            if row and row.price_m2:
-                return float(row.price_m2), f"{row.region} (RealityMix)"
+                WHERE source = 'realitymix' AND transaction_type = :txn
+                ORDER BY region, fetched_at DESC
+            """), {"txn": transaction_type})).all()
+            realitymix = {r.region: float(r.price_m2) for r in rm_rows if r.price_m2}
         except Exception:
             pass
 
-    # --- Layer 4: Static Deloitte district data ---
-    if district is not None:
-        prices = PRAGUE_DISTRICT_PRICES_PRODEJ if transaction_type == "prodej" else PRAGUE_DISTRICT_PRICES_PRONAJEM
-        if district in prices:
-            return float(prices[district]), f"Praha {district} (Deloitte)"
-
-    # --- Layer 5: Static CZSO regional data ---
-    region = get_region_for_city(city)
-    if region:
-        prices = CZSO_PRICES_PRODEJ if transaction_type == "prodej" else CZSO_PRICES_PRONAJEM
-        price = prices.get(region)
-        if price:
-            return float(price), f"{region} (CSU)"
-
-    return None, None
+    ku_names = [(r, r.ku_nazev_normalized or "") for r in ku_rows if r.median_price_m2]
+
+    result: dict[str, tuple[float | None, str | None]] = {}
+    for city in cities:
+        district, ku_part = locations[city]
+        found: tuple[float | None, str | None] | None = None
+
+        if district is not None:
+            # Layer 1: MF rental data (rentals only, KÚ-level)
+            for candidate in _mf_ku_candidates(city) if mf_rows else ():
+                row = next(
+                    (r for r in mf_rows if r.price_m2 and candidate in (r.region or "").lower()),
+                    None,
+                )
+                if row:
+                    found = float(row.price_m2), f"{row.region} (MF)"
+                    break
+
+            # Layer 2: own KÚ median
+            if found is None:
+                if ku_part:
+                    # Exact KÚ name first, then the largest prefix match
+                    row = next((r for r, name in ku_names if name == ku_part), None) or next(
+                        (r for r, name in ku_names if name.startswith(ku_part)), None
+                    )
+                else:
+                    codes = city_ku.get(city, ())
+                    row = next((r for r, _ in ku_names if r.ku_kod in codes), None)
+                if row:
+                    found = (
+                        float(row.median_price_m2),
+                        f"{row.ku_nazev} (median, N={row.sample_count})",
+                    )
+
+            # Layer 3: RealityMix district data
+            if found is None and f"Praha {district}" in realitymix:
+                found = realitymix[f"Praha {district}"], f"Praha {district} (RealityMix)"
+
+            # Layer 4: static Deloitte district data
+            if found is None:
+                prices = PRAGUE_DISTRICT_PRICES_PRODEJ if transaction_type == "prodej" else PRAGUE_DISTRICT_PRICES_PRONAJEM
+                if district in prices:
+                    found = float(prices[district]), f"Praha {district} (Deloitte)"
+
+        # Layer 5: static CZSO regional data
+        if found is None:
+            region = get_region_for_city(city)
+            prices = CZSO_PRICES_PRODEJ if transaction_type == "prodej" else CZSO_PRICES_PRONAJEM
+            price = prices.get(region) if region else None
+            found = (float(price), f"{region} (CSU)") if price else (None, None)
+
+        result[city] = found
+
+    return result
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class PropertyBase(BaseModel):
@@ -21,11 +21,12 @@ class PropertyBase(BaseModel):
     city: str | None = None
     district: str | None = None
     address: str | None = None
-    images: list[str] = []
+    images: list[str] = Field(default_factory=list)
 
 
 class PropertyResponse(PropertyBase):
-    model_config = ConfigDict(from_attributes=True)
+    # Read-only response rows; frozen is inherited by PropertyDetailResponse
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
     id: int
     status: str
@@ -37,12 +38,12 @@ class PropertyResponse(PropertyBase):
 
 
 class PropertyDetailResponse(PropertyResponse):
-    price_history: list["PriceHistoryResponse"] = []
-    raw_data: dict = {}
+    price_history: list["PriceHistoryResponse"] = Field(default_factory=list)
+    raw_data: dict = Field(default_factory=dict)
 
 
 class PriceHistoryResponse(BaseModel):
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
     id: int
     price: float
@@ -51,11 +52,16 @@ class PriceHistoryResponse(BaseModel):
 
 
 class PropertyListResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     items: list[PropertyResponse]
     total: int
     page: int
     per_page: int
     pages: int
+    has_more: bool = False
+    estimated_total: bool = False
+    next_cursor: str | None = None
 
 
 class StatsResponse(BaseModel):
@@ -1,144 +1,93 @@
 import logging
-import math
 
-from sqlalchemy import select, update, and_
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Property
-
 logger = logging.getLogger(__name__)
 
-
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance in meters between two GPS points."""
-    R = 6371000  # Earth radius in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-
-def compute_similarity_score(prop_a: dict, prop_b: dict) -> int:
-    """Compute deduplication score between two properties.
-    Score >= 5 means likely duplicate."""
-    score = 0
-
-    # GPS proximity (2 points)
-    if all(
-        v is not None
-        for v in [
-            prop_a.get("latitude"),
-            prop_a.get("longitude"),
-            prop_b.get("latitude"),
-            prop_b.get("longitude"),
-        ]
-    ):
-        dist = haversine_distance(
-            prop_a["latitude"],
-            prop_a["longitude"],
-            prop_b["latitude"],
-            prop_b["longitude"],
-        )
-        if dist <= 50:
-            score += 2
-
-    # Same disposition (1 point)
-    if (
-        prop_a.get("disposition")
-        and prop_b.get("disposition")
-        and prop_a["disposition"] == prop_b["disposition"]
-    ):
-        score += 1
-
-    # Similar area ±5% (1 point)
-    if prop_a.get("size_m2") and prop_b.get("size_m2"):
-        ratio = prop_a["size_m2"] / prop_b["size_m2"]
-        if 0.95 <= ratio <= 1.05:
-            score += 1
-
-    # Similar price ±10% (1 point)
-    if prop_a.get("price") and prop_b.get("price"):
-        ratio = prop_a["price"] / prop_b["price"]
-        if 0.90 <= ratio <= 1.10:
-            score += 1
-
-    # Same property type + transaction type (1 point)
-    if (
-        prop_a.get("property_type") == prop_b.get("property_type")
-        and prop_a.get("transaction_type") == prop_b.get("transaction_type")
-    ):
-        score += 1
-
-    return score
+# GPS gate: pairs further apart than this are never duplicates
+DUPLICATE_RADIUS_M = 50
+# Similarity score (out of 6) from which a pair is linked
+DUPLICATE_SCORE = 5
+# Planar pre-filter for the GPS gate, in degrees; 50 m spans at most
+# ~0.00072° of longitude at Czech latitudes, so this never drops a pair
+DUPLICATE_RADIUS_DEG = 0.0008
+
+# Similarity score over all cross-source pairs of active listings:
+#   2 points  within DUPLICATE_RADIUS_M of each other (required)
+#   1 point   same non-empty disposition
+#   1 point   size_m2 within ±5%
+#   1 point   price within ±10%
+#   1 point   same property_type and transaction_type
+# The degree ST_DWithin uses idx_properties_geom_active; the geography one
+# is the exact (spherical) 50 m gate.
+DUPLICATE_CANDIDATES_SQL = text("""
+    SELECT a.id AS a_id, a.first_seen_at AS a_first_seen,
+           b.id AS b_id, b.first_seen_at AS b_first_seen
+    FROM properties a
+    JOIN properties b
+      ON b.source > a.source
+     AND b.status = 'active'
+     AND b.duplicate_of IS NULL
+     AND ST_DWithin(a.geom, b.geom, :radius_deg)
+     AND ST_DWithin(a.geom::geography, b.geom::geography, :radius_m, false)
+    WHERE a.status = 'active'
+      AND a.duplicate_of IS NULL
+      AND 2
+        + CASE WHEN a.disposition <> '' AND a.disposition = b.disposition THEN 1 ELSE 0 END
+        + CASE WHEN a.size_m2 > 0 AND b.size_m2 > 0
+                AND a.size_m2 / b.size_m2 BETWEEN 0.95 AND 1.05 THEN 1 ELSE 0 END
+        + CASE WHEN a.price > 0 AND b.price > 0
+                AND a.price / b.price BETWEEN 0.90 AND 1.10 THEN 1 ELSE 0 END
+        + CASE WHEN a.property_type IS NOT DISTINCT FROM b.property_type
+                AND a.transaction_type IS NOT DISTINCT FROM b.transaction_type
+               THEN 1 ELSE 0 END
+        >= :min_score
+    ORDER BY a.first_seen_at, b.first_seen_at
+""")
+
+# All links of a pass in one statement
+LINK_DUPLICATES_SQL = text("""
+    UPDATE properties p
+    SET duplicate_of = v.older
+    FROM unnest(CAST(:newer AS bigint[]), CAST(:older AS bigint[])) AS v(newer, older)
+    WHERE p.id = v.newer
+""")
 
 
 async def run_deduplication(db: AsyncSession):
-    """Find and link duplicate properties across different sources."""
-    query = (
-        select(Property)
-        .where(
-            Property.status == "active",
-            Property.duplicate_of.is_(None),
-            Property.latitude.isnot(None),
-            Property.longitude.isnot(None),
-        )
-        .order_by(Property.first_seen_at.asc())
+    """Find and link duplicate properties across different sources.
+
+    Candidate pairs and their scores come from one PostGIS query
+    (DUPLICATE_CANDIDATES_SQL, which defines the scoring rules).
+    """
+    result = await db.execute(
+        DUPLICATE_CANDIDATES_SQL,
+        {
+            "radius_deg": DUPLICATE_RADIUS_DEG,
+            "radius_m": DUPLICATE_RADIUS_M,
+            "min_score": DUPLICATE_SCORE,
+        },
     )
 
-    result = await db.execute(query)
-    properties = result.scalars().all()
-
-    # Group by source for cross-source comparison
-    by_source: dict[str, list] = {}
-    for prop in properties:
-        by_source.setdefault(prop.source, []).append(prop)
-
-    sources = list(by_source.keys())
-    duplicates_found = 0
-
-    for i, source_a in enumerate(sources):
-        for source_b in sources[i + 1:]:
-            for prop_a in by_source[source_a]:
-                for prop_b in by_source[source_b]:
-                    if prop_b.duplicate_of is not None:
-                        continue
-
-                    prop_a_dict = {
-                        "latitude": prop_a.latitude,
-                        "longitude": prop_a.longitude,
-                        "disposition": prop_a.disposition,
-                        "size_m2": float(prop_a.size_m2) if prop_a.size_m2 else None,
-                        "price": float(prop_a.price) if prop_a.price else None,
-                        "property_type": prop_a.property_type,
-                        "transaction_type": prop_a.transaction_type,
-                    }
-                    prop_b_dict = {
-                        "latitude": prop_b.latitude,
-                        "longitude": prop_b.longitude,
-                        "disposition": prop_b.disposition,
-                        "size_m2": float(prop_b.size_m2) if prop_b.size_m2 else None,
-                        "price": float(prop_b.price) if prop_b.price else None,
-                        "property_type": prop_b.property_type,
-                        "transaction_type": prop_b.transaction_type,
-                    }
-
-                    score = compute_similarity_score(prop_a_dict, prop_b_dict)
-                    if score >= 5:
-                        # Link newer to older
-                        older = prop_a if prop_a.first_seen_at <= prop_b.first_seen_at else prop_b
-                        newer = prop_b if older is prop_a else prop_a
-                        newer.duplicate_of = older.id
-                        duplicates_found += 1
-
-    if duplicates_found > 0:
+    # Linking stays sequential: a property linked earlier in this pass
+    # is not linked again
+    links: dict[int, int] = {}
+    for row in result:
+        if row.a_id in links or row.b_id in links:
+            continue
+        # Link newer to older
+        if row.a_first_seen <= row.b_first_seen:
+            links[row.b_id] = row.a_id
+        else:
+            links[row.a_id] = row.b_id
+
+    if links:
+        await db.execute(
+            LINK_DUPLICATES_SQL,
+            {"newer": list(links), "older": list(links.values())},
+        )
         await db.commit()
-        logger.info(f"Deduplication: found {duplicates_found} duplicates")
+        logger.info(f"Deduplication: found {len(links)} duplicates")
     else:
         logger.info("Deduplication: no new duplicates found")
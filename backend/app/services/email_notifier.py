@@ -0,0 +1,133 @@
+"""Match new listings and price drops to email subscriptions and send them.
+
+Matching runs as a single INSERT ... SELECT join between properties and
+active subscriptions, so the N x M comparison happens in PostgreSQL; the
+outbox's unique constraint makes re-running over the same window a no-op.
+"""
+
+import logging
+from collections import defaultdict
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.email_service import (
+    build_new_listing_email,
+    build_price_drop_email,
+    is_email_configured,
+    send_emails_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+# How far back each run looks for matches; overlaps are deduplicated
+MATCH_WINDOW = "1 day"
+SEND_BATCH_LIMIT = 1000
+
+_SUBSCRIPTION_MATCH = """
+    s.active
+    AND p.status = 'active'
+    AND p.duplicate_of IS NULL
+    AND (s.property_type IS NULL OR s.property_type = p.property_type)
+    AND (s.transaction_type IS NULL OR s.transaction_type = p.transaction_type)
+    AND (s.city IS NULL OR p.city ILIKE '%' || s.city || '%')
+    AND (s.disposition IS NULL OR p.disposition = ANY(
+        string_to_array(replace(s.disposition, ' ', ''), ',')))
+    AND (s.price_min IS NULL OR p.price >= s.price_min)
+    AND (s.price_max IS NULL OR p.price <= s.price_max)
+    AND (s.size_min IS NULL OR p.size_m2 >= s.size_min)
+    AND (s.size_max IS NULL OR p.size_m2 <= s.size_max)
+"""
+
+QUEUE_NEW_LISTINGS = text(f"""
+    INSERT INTO email_outbox (subscription_id, property_id, kind)
+    SELECT s.id, p.id, 'new_listing'
+    FROM properties p
+    JOIN email_subscriptions s
+      ON s.notify_new AND {_SUBSCRIPTION_MATCH}
+    WHERE p.first_seen_at >= now() - interval '{MATCH_WINDOW}'
+      AND p.first_seen_at >= s.created_at
+    ON CONFLICT ON CONSTRAINT uq_email_outbox DO NOTHING
+""")
+
+QUEUE_PRICE_DROPS = text(f"""
+    INSERT INTO email_outbox (subscription_id, property_id, kind)
+    SELECT DISTINCT s.id, p.id, 'price_drop'
+    FROM property_last_price lp
+    JOIN properties p ON p.id = lp.property_id AND p.price < lp.price
+    JOIN price_history ph
+      ON ph.property_id = p.id AND ph.recorded_at >= now() - interval '{MATCH_WINDOW}'
+    JOIN email_subscriptions s
+      ON s.notify_price_drop AND {_SUBSCRIPTION_MATCH}
+    WHERE ph.recorded_at >= s.created_at
+    ON CONFLICT ON CONSTRAINT uq_email_outbox DO NOTHING
+""")
+
+PENDING_QUERY = text("""
+    SELECT o.id, o.kind, s.email,
+           p.url, p.title, p.city, p.disposition, p.size_m2, p.price,
+           lp.price AS old_price
+    FROM email_outbox o
+    JOIN email_subscriptions s ON s.id = o.subscription_id
+    JOIN properties p ON p.id = o.property_id
+    LEFT JOIN property_last_price lp ON lp.property_id = o.property_id
+    WHERE o.sent_at IS NULL
+    ORDER BY o.id
+    LIMIT :limit
+""")
+
+
+async def queue_subscription_matches(session: AsyncSession) -> int:
+    """Insert outbox rows for every (subscription, property) match. Returns rows queued."""
+    new = await session.execute(QUEUE_NEW_LISTINGS)
+    drops = await session.execute(QUEUE_PRICE_DROPS)
+    await session.commit()
+    return new.rowcount + drops.rowcount
+
+
+async def send_pending_emails(session: AsyncSession) -> int:
+    """Send queued matches as one email per (recipient, kind). Returns emails sent."""
+    rows = (await session.execute(PENDING_QUERY, {"limit": SEND_BATCH_LIMIT})).mappings().all()
+    if not rows:
+        return 0
+
+    grouped: dict[tuple[str, str], list[dict]] = defaultdict(list)
+    for row in rows:
+        grouped[(row["email"], row["kind"])].append(dict(row))
+
+    items = []
+    for (email, kind), props in grouped.items():
+        if kind == "price_drop":
+            for p in props:
+                p["new_price"] = p["price"]
+            items.append((email, f"Pokles cen: {len(props)} nemovitosti", build_price_drop_email(props)))
+        else:
+            items.append((email, f"Nove nemovitosti: {len(props)}", build_new_listing_email(props)))
+
+    sent = await send_emails_batch(items)
+
+    # Only rows whose email went out are marked; the rest stay pending
+    sent_ids = [
+        p["id"]
+        for props, ok in zip(grouped.values(), sent)
+        if ok
+        for p in props
+    ]
+    if sent_ids:
+        await session.execute(
+            text("UPDATE email_outbox SET sent_at = now() WHERE id = ANY(:ids)"),
+            {"ids": sent_ids},
+        )
+        await session.commit()
+    return sum(sent)
+
+
+async def run_email_notifications(session: AsyncSession) -> int:
+    """Queue new matches and send everything pending."""
+    if not is_email_configured():
+        return 0
+    queued = await queue_subscription_matches(session)
+    sent = await send_pending_emails(session)
+    if queued or sent:
+        logger.info(f"Email notifications: queued {queued} matches, sent {sent} emails")
+    return sent
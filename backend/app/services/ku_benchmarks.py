@@ -7,30 +7,52 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 
+# Properties per UPDATE in assign_ku_to_properties
+ASSIGN_BATCH_SIZE = 10_000
+
 
 async def assign_ku_to_properties(session: AsyncSession) -> int:
     """Assign katastrální území codes to Prague properties using PostGIS spatial join.
 
     Only processes properties that:
-    - Have GPS coordinates (latitude, longitude)
+    - Have GPS coordinates (geom)
     - Don't have a KÚ code assigned yet (ku_kod IS NULL)
 
+    Works through them in primary-key batches of ASSIGN_BATCH_SIZE, committing
+    each, so no single statement holds the whole backlog. Listings outside
+    Prague keep ku_kod NULL, hence the keyset (id > last) walk.
+
     Returns count of properties updated.
     """
-    result = await session.execute(text("""
-        UPDATE properties p
-        SET ku_kod = ku.ku_kod, ku_nazev = ku.ku_nazev
-        FROM prague_ku ku
-        WHERE p.latitude IS NOT NULL
-          AND p.longitude IS NOT NULL
-          AND p.ku_kod IS NULL
-          AND ST_Contains(
-              ku.geom,
-              ST_SetSRID(ST_MakePoint(p.longitude, p.latitude), 4326)
-          )
-    """))
-    count = result.rowcount
-    await session.commit()
+    count = 0
+    last_id = 0
+    while True:
+        result = await session.execute(text("""
+            WITH batch AS (
+                SELECT id FROM properties
+                WHERE ku_kod IS NULL
+                  AND geom IS NOT NULL
+                  AND id > :last_id
+                ORDER BY id
+                LIMIT :batch_size
+            ),
+            updated AS (
+                UPDATE properties p
+                SET ku_kod = ku.ku_kod
+                FROM batch b, prague_ku ku
+                WHERE p.id = b.id
+                  AND ST_Contains(ku.geom, p.geom)
+                RETURNING p.id
+            )
+            SELECT (SELECT max(id) FROM batch) AS last_id,
+                   (SELECT count(*) FROM updated) AS updated
+        """), {"last_id": last_id, "batch_size": ASSIGN_BATCH_SIZE})
+        row = result.one()
+        await session.commit()
+        if row.last_id is None:
+            break
+        count += row.updated
+        last_id = row.last_id
 
     if count > 0:
         logger.info(f"Assigned KÚ codes to {count} properties.")
@@ -46,30 +68,68 @@ async def compute_ku_price_stats(session: AsyncSession) -> int:
 
     Returns count of stats records upserted.
     """
+    # Listings are collapsed to (group, whole CZK/m²) with a peer count
+    # first, so the median orders distinct values instead of every listing.
+    # For p = 0.5, PERCENTILE_CONT is the mean of the values at 0-based
+    # positions floor((n-1)/2) and ceil((n-1)/2), found on the running count.
     result = await session.execute(text("""
+        WITH grouped AS (
+            SELECT
+                p.ku_kod,
+                p.property_type,
+                p.transaction_type,
+                ROUND(p.price_m2) AS price_m2,
+                COUNT(*) AS peer_count,
+                SUM(p.price_m2) AS price_m2_sum
+            FROM properties p
+            WHERE p.status = 'active'
+              AND p.ku_kod IS NOT NULL
+              AND p.duplicate_of IS NULL
+              AND p.transaction_type IS NOT NULL
+              -- price_m2 is NULL unless size_m2 > 0; the range also implies price > 0
+              AND p.price_m2 BETWEEN 5000 AND 500000
+            GROUP BY 1, 2, 3, 4
+        ),
+        running AS (
+            SELECT
+                g.*,
+                SUM(peer_count) OVER (
+                    PARTITION BY ku_kod, property_type, transaction_type
+                    ORDER BY price_m2
+                ) AS running_count,
+                SUM(peer_count) OVER (
+                    PARTITION BY ku_kod, property_type, transaction_type
+                ) AS total_count
+            FROM grouped g
+        ),
+        stats AS (
+            SELECT
+                ku_kod,
+                property_type,
+                transaction_type,
+                (MIN(price_m2) FILTER (WHERE running_count > FLOOR((total_count - 1) / 2.0))
+                 + MIN(price_m2) FILTER (WHERE running_count > CEIL((total_count - 1) / 2.0))
+                ) / 2 AS median_price_m2,
+                ROUND(SUM(price_m2_sum) / SUM(peer_count), 0) AS avg_price_m2,
+                SUM(peer_count) AS sample_count
+            FROM running
+            GROUP BY ku_kod, property_type, transaction_type
+            HAVING SUM(peer_count) >= 3
+        )
         INSERT INTO ku_price_stats
             (ku_kod, ku_nazev, property_type, transaction_type,
              median_price_m2, avg_price_m2, sample_count, computed_at)
         SELECT
-            p.ku_kod,
-            p.ku_nazev,
-            p.property_type,
-            p.transaction_type,
-            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY p.price / p.size_m2),
-            ROUND(AVG(p.price / p.size_m2), 0),
-            COUNT(*),
+            s.ku_kod,
+            ku.ku_nazev,
+            s.property_type,
+            s.transaction_type,
+            s.median_price_m2,
+            s.avg_price_m2,
+            s.sample_count,
             NOW()
-        FROM properties p
-        WHERE p.status = 'active'
-          AND p.ku_kod IS NOT NULL
-          AND p.price IS NOT NULL
-          AND p.price > 0
-          AND p.size_m2 > 0
-          AND p.duplicate_of IS NULL
-          AND p.transaction_type IS NOT NULL
-          AND (p.price / p.size_m2) BETWEEN 5000 AND 500000
-        GROUP BY p.ku_kod, p.ku_nazev, p.property_type, p.transaction_type
-        HAVING COUNT(*) >= 3
+        FROM stats s
+        JOIN prague_ku ku ON ku.ku_kod = s.ku_kod
         ON CONFLICT ON CONSTRAINT uq_ku_price_stats
         DO UPDATE SET
             ku_nazev = EXCLUDED.ku_nazev,
@@ -0,0 +1,21 @@
+"""Maintenance of the monthly price_history partitions."""
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Partitions are created this many months ahead so inserts never fall
+# through to price_history_default
+MONTHS_AHEAD = 2
+
+
+async def ensure_price_history_partitions(session: AsyncSession) -> None:
+    """Create price_history partitions for this month and the next MONTHS_AHEAD."""
+    await session.execute(
+        text("SELECT ensure_price_history_partitions(CURRENT_DATE, :months_ahead)"),
+        {"months_ahead": MONTHS_AHEAD},
+    )
+    await session.commit()
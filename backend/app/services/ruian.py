@@ -4,6 +4,7 @@ import json
 import logging
 from pathlib import Path
 
+import ijson
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -32,66 +33,100 @@ async def load_prague_ku_boundaries(session: AsyncSession) -> int:
 
     logger.info(f"Loading Prague KÚ boundaries from {GEOJSON_PATH}...")
 
-    with open(GEOJSON_PATH, encoding="utf-8") as f:
-        geojson = json.load(f)
-
-    features = geojson.get("features", [])
-    if not features:
+    seen = 0
+    rows: list[tuple[int, str, str]] = []
+    # Stream features one at a time instead of materializing the whole file;
+    # use_float keeps coordinates JSON-serializable (no Decimal)
+    with open(GEOJSON_PATH, "rb") as f:
+        for feature in ijson.items(f, "features.item", use_float=True):
+            seen += 1
+            row = _feature_row(feature)
+            if row:
+                rows.append(row)
+
+    if not seen:
         logger.error("GeoJSON has no features")
         return 0
 
-    count = 0
-    for feature in features:
-        props = feature.get("properties", {})
-        geom = feature.get("geometry")
-
-        # Try common property names for KÚ code and name
-        ku_kod = (
-            props.get("ku_kod")
-            or props.get("KOD")
-            or props.get("kod")
-            or props.get("KOD_KU")
-            or props.get("KU_KOD")
-            or props.get("OBJECTID")
-        )
-        ku_nazev = (
-            props.get("ku_nazev")
-            or props.get("NAZEV")
-            or props.get("nazev")
-            or props.get("NAZEV_KU")
-            or props.get("KU_NAZEV")
-            or props.get("name")
-            or ""
-        )
-
-        if not ku_kod or not geom:
-            continue
-
-        ku_kod = int(ku_kod)
-        geom_json = json.dumps(geom)
-
-        # Ensure geometry is MultiPolygon
-        geom_type = geom.get("type", "")
-        if geom_type == "Polygon":
-            # Wrap single Polygon into MultiPolygon
-            convert_expr = "ST_Multi(ST_SetSRID(ST_GeomFromGeoJSON(:geom_json), 4326))"
-        else:
-            convert_expr = "ST_SetSRID(ST_GeomFromGeoJSON(:geom_json), 4326)"
-
+    # One INSERT for all features; the spatial index is built once afterwards
+    # instead of per row. If any geometry is unusable, the batch is retried
+    # one feature per savepoint so only the bad KÚ are skipped.
+    try:
+        await session.execute(text("DROP INDEX IF EXISTS idx_prague_ku_geom"))
         try:
-            await session.execute(
-                text(f"""
-                    INSERT INTO prague_ku (ku_kod, ku_nazev, geom)
-                    VALUES (:ku_kod, :ku_nazev, {convert_expr})
-                    ON CONFLICT (ku_kod) DO NOTHING
-                """),
-                {"ku_kod": ku_kod, "ku_nazev": ku_nazev, "geom_json": geom_json},
-            )
-            count += 1
+            async with session.begin_nested():
+                count = await _insert_rows(session, rows)
         except Exception as e:
-            logger.warning(f"Failed to insert KÚ {ku_kod} ({ku_nazev}): {e}")
-            continue
+            logger.warning(f"Batch insert of Prague KÚ failed, retrying one by one: {e}")
+            count = 0
+            for row in rows:
+                try:
+                    async with session.begin_nested():
+                        count += await _insert_rows(session, [row])
+                except Exception as e:
+                    logger.warning(f"Failed to insert KÚ {row[0]} ({row[1]}): {e}")
+        await session.execute(text(
+            "CREATE INDEX idx_prague_ku_geom ON prague_ku USING SPGIST (geom)"
+        ))
+        await session.execute(text("ANALYZE prague_ku"))
+    except Exception as e:
+        logger.error(f"Failed to insert Prague KÚ boundaries: {e}")
+        await session.rollback()
+        return 0
 
     await session.commit()
     logger.info(f"Loaded {count} Prague KÚ boundaries.")
     return count
+
+
+async def _insert_rows(session: AsyncSession, rows: list[tuple[int, str, str]]) -> int:
+    """Insert (ku_kod, ku_nazev, geometry JSON) rows. Returns count of inserted rows."""
+    # ST_Multi leaves MultiPolygons unchanged
+    result = await session.execute(
+        text("""
+            INSERT INTO prague_ku (ku_kod, ku_nazev, geom)
+            SELECT kod, nazev, ST_Multi(ST_SetSRID(ST_GeomFromGeoJSON(geom_json), 4326))
+            FROM unnest(
+                CAST(:kods AS integer[]),
+                CAST(:nazvy AS text[]),
+                CAST(:geoms AS text[])
+            ) AS v(kod, nazev, geom_json)
+            ON CONFLICT (ku_kod) DO NOTHING
+        """),
+        {
+            "kods": [r[0] for r in rows],
+            "nazvy": [r[1] for r in rows],
+            "geoms": [r[2] for r in rows],
+        },
+    )
+    return result.rowcount
+
+
+def _feature_row(feature: dict) -> tuple[int, str, str] | None:
+    """(ku_kod, ku_nazev, geometry JSON) for a GeoJSON feature, or None if unusable."""
+    props = feature.get("properties", {})
+    geom = feature.get("geometry")
+
+    # Try common property names for KÚ code and name
+    ku_kod = (
+        props.get("ku_kod")
+        or props.get("KOD")
+        or props.get("kod")
+        or props.get("KOD_KU")
+        or props.get("KU_KOD")
+        or props.get("OBJECTID")
+    )
+    ku_nazev = (
+        props.get("ku_nazev")
+        or props.get("NAZEV")
+        or props.get("nazev")
+        or props.get("NAZEV_KU")
+        or props.get("KU_NAZEV")
+        or props.get("name")
+        or ""
+    )
+
+    if not ku_kod or not geom:
+        return None
+
+    return int(ku_kod), ku_nazev, json.dumps(geom)
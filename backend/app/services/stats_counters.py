@@ -0,0 +1,142 @@
+"""Redis counters for the active-listing breakdowns shown on the dashboard.
+
+Scrapers adjust the counters on every active/removed transition; a nightly
+reconciliation overwrites them with the SQL truth to absorb missed events.
+"""
+
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Property
+
+logger = logging.getLogger(__name__)
+
+TOTAL_ACTIVE_KEY = "stats:counters:total_active"
+BY_SOURCE_KEY = "stats:counters:by_source"
+BY_TYPE_KEY = "stats:counters:by_type"
+BY_TRANSACTION_KEY = "stats:counters:by_transaction"
+
+# Held by a scraper while it commits a run and applies its deltas, and by the
+# reconciliation while it reads SQL and rewrites the counters
+LOCK_KEY = "stats:counters:lock"
+LOCK_TIMEOUT = 60  # seconds
+
+
+@asynccontextmanager
+async def counters_lock(redis):
+    """Serialize counter updates with reconciliation.
+
+    Best effort: if the lock cannot be taken, the block runs unlocked and the
+    next reconciliation absorbs any drift.
+    """
+    lock = redis.lock(LOCK_KEY, timeout=LOCK_TIMEOUT, blocking_timeout=LOCK_TIMEOUT)
+    try:
+        acquired = await lock.acquire()
+    except Exception as e:
+        logger.error(f"Failed to acquire stats counters lock: {e}")
+        acquired = False
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except Exception as e:
+                logger.error(f"Failed to release stats counters lock: {e}")
+
+
+async def apply_active_deltas(redis, source: str, deltas: Counter) -> None:
+    """Apply net changes in active listings, keyed by (property_type, transaction_type)."""
+    deltas = {key: n for key, n in deltas.items() if n}
+    if not deltas:
+        return
+
+    by_type: Counter = Counter()
+    by_transaction: Counter = Counter()
+    for (property_type, transaction_type), n in deltas.items():
+        if property_type:
+            by_type[property_type] += n
+        if transaction_type:
+            by_transaction[transaction_type] += n
+    total = sum(deltas.values())
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.incrby(TOTAL_ACTIVE_KEY, total)
+        pipe.hincrby(BY_SOURCE_KEY, source, total)
+        for property_type, n in by_type.items():
+            pipe.hincrby(BY_TYPE_KEY, property_type, n)
+        for transaction_type, n in by_transaction.items():
+            pipe.hincrby(BY_TRANSACTION_KEY, transaction_type, n)
+        await pipe.execute()
+
+
+async def reconcile_counters(session: AsyncSession, redis) -> int:
+    """Recompute every counter from the properties table. Returns total_active.
+
+    Runs under counters_lock, so no scraper run is between its commit and
+    its counter update while SQL is read.
+    """
+    async with counters_lock(redis):
+        rows = (
+            await session.execute(
+                select(
+                    Property.source, Property.property_type, Property.transaction_type,
+                    func.count(),
+                )
+                .where(Property.status == "active")
+                .group_by(Property.source, Property.property_type, Property.transaction_type)
+            )
+        ).all()
+
+        by_source: Counter = Counter()
+        by_type: Counter = Counter()
+        by_transaction: Counter = Counter()
+        for source, property_type, transaction_type, cnt in rows:
+            by_source[source] += cnt
+            if property_type:
+                by_type[property_type] += cnt
+            if transaction_type:
+                by_transaction[transaction_type] += cnt
+        total = sum(by_source.values())
+
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(BY_SOURCE_KEY, BY_TYPE_KEY, BY_TRANSACTION_KEY)
+            pipe.set(TOTAL_ACTIVE_KEY, total)
+            for key, counts in (
+                (BY_SOURCE_KEY, by_source),
+                (BY_TYPE_KEY, by_type),
+                (BY_TRANSACTION_KEY, by_transaction),
+            ):
+                if counts:
+                    pipe.hset(key, mapping=dict(counts))
+            await pipe.execute()
+
+    logger.info(f"Reconciled stats counters: {total} active listings")
+    return total
+
+
+async def read_counters(redis) -> dict | None:
+    """Return the current counters, or None if they have not been seeded yet."""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(TOTAL_ACTIVE_KEY)
+        pipe.hgetall(BY_SOURCE_KEY)
+        pipe.hgetall(BY_TYPE_KEY)
+        pipe.hgetall(BY_TRANSACTION_KEY)
+        total, by_source, by_type, by_transaction = await pipe.execute()
+
+    if total is None:
+        return None
+
+    def decode(counts: dict) -> dict[str, int]:
+        return {k.decode(): int(v) for k, v in counts.items() if int(v) > 0}
+
+    return {
+        "total_active": max(int(total), 0),
+        "by_source": decode(by_source),
+        "by_type": decode(by_type),
+        "by_transaction": decode(by_transaction),
+    }
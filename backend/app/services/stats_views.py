@@ -0,0 +1,46 @@
+"""Refresh of the materialized views backing the dashboard stats."""
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+async def refresh_property_stats(session: AsyncSession) -> None:
+    """Recompute mv_property_stats without blocking concurrent readers."""
+    await session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_property_stats"))
+    await session.commit()
+
+
+async def refresh_price_drops(session: AsyncSession) -> None:
+    """Recompute today's price-drop count in mv_price_drops_daily."""
+    await session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_price_drops_daily"))
+    await session.commit()
+
+
+async def snapshot_last_prices(session: AsyncSession) -> int:
+    """Roll property_last_price forward to the start of the current UTC day.
+
+    Only price_history rows recorded since the previous snapshot are read.
+    Returns the number of properties whose snapshot changed.
+    """
+    result = await session.execute(text("""
+        INSERT INTO property_last_price (property_id, price, snapshot_date)
+        SELECT DISTINCT ON (ph.property_id)
+            ph.property_id, ph.price, (now() AT TIME ZONE 'UTC')::date
+        FROM price_history ph
+        WHERE ph.recorded_at < date_trunc('day', now(), 'UTC')
+          AND ph.recorded_at >= COALESCE(
+              (SELECT max(snapshot_date) FROM property_last_price)::timestamp AT TIME ZONE 'UTC',
+              '-infinity'
+          )
+        ORDER BY ph.property_id, ph.recorded_at DESC
+        ON CONFLICT (property_id) DO UPDATE
+        SET price = EXCLUDED.price, snapshot_date = EXCLUDED.snapshot_date
+    """))
+    await session.commit()
+    count = result.rowcount
+    logger.info(f"Snapshotted last prices for {count} properties.")
+    return count
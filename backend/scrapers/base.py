@@ -2,22 +2,35 @@ import asyncio
 import json
 import logging
 from abc import ABC, abstractmethod
+from collections import Counter
 from datetime import datetime, timezone
 
 import httpx
 import redis.asyncio as aioredis
-from sqlalchemy import select, update
+from sqlalchemy import literal_column, select, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.models import Property, ScrapeRun
+from app.services.stats_counters import apply_active_deltas, counters_lock
 
 logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
 RETRY_DELAY = 5.0  # seconds
 
+# Listings per multi-row upsert in run_full
+SAVE_BATCH_SIZE = 500
+
+# Columns refreshed when a scraped listing already exists. property_type and
+# transaction_type are left alone, so stored values stay authoritative.
+UPSERT_UPDATE_COLUMNS = (
+    "title", "description", "price", "size_m2", "rooms", "latitude",
+    "longitude", "city", "district", "address", "images", "raw_data",
+    "status", "missed_runs", "last_seen_at",
+)
+
 
 class BaseScraper(ABC):
     source: str = ""
@@ -35,6 +48,8 @@ class BaseScraper(ABC):
         self.redis = aioredis.from_url(settings.redis_url)
         self.run: ScrapeRun | None = None
         self.seen_ids: set[str] = set()
+        # Net change in active listings per (property_type, transaction_type)
+        self.active_deltas: Counter = Counter()
 
     async def fetch_with_retry(self, url: str, method: str = "GET", **kwargs) -> httpx.Response:
         """Fetch URL with retry logic for transient failures."""
@@ -87,84 +102,134 @@ class BaseScraper(ABC):
     async def save_listing(self, data: dict) -> tuple[str, int | None]:
         """Upsert a single listing. Returns (status, property_id).
         Status is 'new', 'price_changed', or 'updated'."""
-        external_id = data["external_id"]
-        self.seen_ids.add(external_id)
+        return (await self.save_listings_batch([data]))[0]
+
+    async def save_listings_batch(self, batch: list[dict]) -> list[tuple[str, int | None]]:
+        """Upsert many listings in one statement.
 
+        Returns (status, property_id) for each item of batch, in order, with
+        the same statuses as save_listing.
+        """
         now = datetime.now(timezone.utc)
+        # One row per external_id: ON CONFLICT cannot touch a row twice
+        rows: dict[str, dict] = {}
+        for data in batch:
+            external_id = data["external_id"]
+            self.seen_ids.add(external_id)
+            rows[external_id] = {
+                "source": self.source,
+                "external_id": external_id,
+                "url": data.get("url"),
+                "title": data.get("title"),
+                "description": data.get("description"),
+                "property_type": data.get("property_type"),
+                "transaction_type": data.get("transaction_type"),
+                "disposition": data.get("disposition"),
+                "price": data.get("price"),
+                "size_m2": data.get("size_m2"),
+                "rooms": data.get("rooms"),
+                "latitude": data.get("latitude"),
+                "longitude": data.get("longitude"),
+                "city": data.get("city"),
+                "district": data.get("district"),
+                "address": data.get("address"),
+                "images": data.get("images", []),
+                "raw_data": data.get("raw_data", {}),
+                "status": "active",
+                "missed_runs": 0,
+                "last_seen_at": now,
+            }
 
-        # Check if listing already exists (before upsert)
+        # The stored rows as they were before the upsert: all parts of one
+        # statement see the same snapshot
         existing = (
-            await self.db.execute(
-                select(Property.id, Property.price)
-                .where(Property.source == self.source, Property.external_id == external_id)
-            )
-        ).first()
-
-        old_price = float(existing.price) if existing and existing.price else None
-
-        stmt = (
-            insert(Property)
-            .values(
-                source=self.source,
-                external_id=external_id,
-                url=data.get("url"),
-                title=data.get("title"),
-                description=data.get("description"),
-                property_type=data.get("property_type"),
-                transaction_type=data.get("transaction_type"),
-                disposition=data.get("disposition"),
-                price=data.get("price"),
-                size_m2=data.get("size_m2"),
-                rooms=data.get("rooms"),
-                latitude=data.get("latitude"),
-                longitude=data.get("longitude"),
-                city=data.get("city"),
-                district=data.get("district"),
-                address=data.get("address"),
-                images=data.get("images", []),
-                raw_data=data.get("raw_data", {}),
-                status="active",
-                missed_runs=0,
-                last_seen_at=now,
+            select(
+                Property.external_id, Property.price, Property.status,
+                Property.property_type, Property.transaction_type,
             )
+            .where(Property.source == self.source, Property.external_id.in_(list(rows)))
+            .cte("existing")
+        )
+
+        insert_stmt = insert(Property).values(list(rows.values()))
+        upsert = (
+            insert_stmt
             .on_conflict_do_update(
                 constraint="uq_source_external",
-                set_={
-                    "title": data.get("title"),
-                    "description": data.get("description"),
-                    "price": data.get("price"),
-                    "size_m2": data.get("size_m2"),
-                    "rooms": data.get("rooms"),
-                    "latitude": data.get("latitude"),
-                    "longitude": data.get("longitude"),
-                    "city": data.get("city"),
-                    "district": data.get("district"),
-                    "address": data.get("address"),
-                    "images": data.get("images", []),
-                    "raw_data": data.get("raw_data", {}),
-                    "status": "active",
-                    "missed_runs": 0,
-                    "last_seen_at": now,
-                },
+                set_={col: insert_stmt.excluded[col] for col in UPSERT_UPDATE_COLUMNS},
+            )
+            # xmax is 0 only on a freshly inserted row version
+            .returning(
+                Property.id, Property.external_id,
+                literal_column("xmax = 0").label("inserted"),
             )
-            .returning(Property.id)
+            .cte("upsert")
         )
+        stmt = select(
+            upsert.c.id, upsert.c.external_id, upsert.c.inserted,
+            existing.c.price, existing.c.status,
+            existing.c.property_type, existing.c.transaction_type,
+        ).select_from(
+            upsert.outerjoin(existing, existing.c.external_id == upsert.c.external_id)
+        )
+
+        saved = {row.external_id: row for row in await self.db.execute(stmt)}
 
-        result = await self.db.execute(stmt)
-        row = result.fetchone()
-        property_id = row.id if row else None
+        results = []
+        handled: set[str] = set()
+        for data in batch:
+            external_id = data["external_id"]
+            row = saved.get(external_id)
+            property_id = row.id if row else None
 
-        if existing is None:
-            return "new", property_id
+            # A repeated listing in the same batch was already counted
+            if external_id in handled:
+                results.append(("updated", property_id))
+                continue
+            handled.add(external_id)
 
-        new_price = float(data["price"]) if data.get("price") else None
-        if old_price and new_price and old_price != new_price:
-            return "price_changed", property_id
+            # New or reactivated listings join the active counters. property_type
+            # and transaction_type are never updated on conflict, so reuse the stored ones.
+            if row is None or row.inserted:
+                self.active_deltas[(data.get("property_type"), data.get("transaction_type"))] += 1
+                results.append(("new", property_id))
+                continue
+            if row.status != "active":
+                self.active_deltas[(row.property_type, row.transaction_type)] += 1
 
-        return "updated", property_id
+            old_price = float(row.price) if row.price else None
+            new_price = float(data["price"]) if data.get("price") else None
+            if old_price and new_price and old_price != new_price:
+                results.append(("price_changed", property_id))
+            else:
+                results.append(("updated", property_id))
+        return results
 
-    async def publish_event(self, event_type: str, property_id: int, extra: dict | None = None):
-        """Publish a property event to Redis for the notification worker and SSE clients."""
+    async def save_listings_singly(
+        self, batch: list[dict]
+    ) -> tuple[list[dict], list[tuple[str, int | None]]]:
+        """Upsert listings one at a time, each in its own savepoint.
+
+        Listings that fail are logged and skipped. Returns the saved listings
+        and their (status, property_id) results, in order.
+        """
+        kept = []
+        results = []
+        for data in batch:
+            try:
+                async with self.db.begin_nested():
+                    result = await self.save_listing(data)
+            except Exception as e:
+                logger.error(
+                    f"[{self.source}] Error saving listing {data.get('external_id')}: {e}"
+                )
+                continue
+            kept.append(data)
+            results.append(result)
+        return kept, results
+
+    def build_event(self, event_type: str, property_id: int, extra: dict | None = None) -> str:
+        """Serialize a property event for the notification worker and SSE clients."""
         event = {
             "type": event_type,
             "property_id": property_id,
@@ -173,13 +238,43 @@ class BaseScraper(ABC):
         }
         if extra:
             event.update(extra)
-        event_json = json.dumps(event)
+        return json.dumps(event)
+
+    async def publish_events(self, events: list[str]):
+        """Publish property events to Redis in one pipelined round trip."""
+        if not events:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.rpush("property_events", *events)
+                # Also publish to pubsub channel for SSE clients
+                for event_json in events:
+                    pipe.publish("property_updates", event_json)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"[{self.source}] Failed to publish {len(events)} events to Redis: {e}")
+
+    async def invalidate_caches(self):
+        """Bump the map markers cache generation so cached responses go stale."""
         try:
-            await self.redis.rpush("property_events", event_json)
-            # Also publish to pubsub channel for SSE clients
-            await self.redis.publish("property_updates", event_json)
+            await self.redis.incr("markers:generation")
         except Exception as e:
-            logger.error(f"[{self.source}] Failed to publish event to Redis: {e}")
+            logger.error(f"[{self.source}] Failed to invalidate markers cache: {e}")
+
+    async def publish_counter_deltas(self, undo: bool = False) -> bool:
+        """Push this run's active-listing changes to the Redis stats counters.
+
+        With undo, reverts a previous push. Returns whether the update succeeded.
+        """
+        deltas = self.active_deltas
+        if undo:
+            deltas = Counter({key: -n for key, n in deltas.items()})
+        try:
+            await apply_active_deltas(self.redis, self.source, deltas)
+        except Exception as e:
+            logger.error(f"[{self.source}] Failed to update stats counters: {e}")
+            return False
+        return True
 
     async def mark_missing(self):
         """Increment missed_runs for listings from this source not seen in this run.
@@ -199,7 +294,7 @@ class BaseScraper(ABC):
         )
 
         # Mark removed if missed 3+ runs
-        await self.db.execute(
+        removed = await self.db.execute(
             update(Property)
             .where(
                 Property.source == self.source,
@@ -207,7 +302,10 @@ class BaseScraper(ABC):
                 Property.missed_runs >= 3,
             )
             .values(status="removed")
+            .returning(Property.property_type, Property.transaction_type)
         )
+        for row in removed:
+            self.active_deltas[(row.property_type, row.transaction_type)] -= 1
 
     async def run_full(self):
         """Execute a complete scrape cycle."""
@@ -219,33 +317,60 @@ class BaseScraper(ABC):
             new_count = 0
             updated_count = 0
 
+            parsed_listings = []
             for raw in raw_listings:
                 try:
-                    parsed = self.parse_listing(raw)
-                    status, property_id = await self.save_listing(parsed)
+                    parsed_listings.append(self.parse_listing(raw))
+                except Exception as e:
+                    logger.error(f"[{self.source}] Error processing listing: {e}")
+
+            for start in range(0, len(parsed_listings), SAVE_BATCH_SIZE):
+                batch = parsed_listings[start:start + SAVE_BATCH_SIZE]
+                # A savepoint per chunk: a failed upsert rolls back only this
+                # chunk and leaves the run's transaction usable
+                try:
+                    async with self.db.begin_nested():
+                        saved = await self.save_listings_batch(batch)
+                except Exception as e:
+                    logger.warning(
+                        f"[{self.source}] Error saving {len(batch)} listings, "
+                        f"retrying one by one: {e}"
+                    )
+                    batch, saved = await self.save_listings_singly(batch)
+
+                events = []
+                for parsed, (status, property_id) in zip(batch, saved):
                     if status == "new":
                         new_count += 1
                         if property_id:
-                            await self.publish_event("new_listing", property_id)
+                            events.append(self.build_event("new_listing", property_id))
                     elif status == "price_changed":
                         updated_count += 1
                         if property_id:
-                            await self.publish_event(
+                            events.append(self.build_event(
                                 "price_drop",
                                 property_id,
                                 {"old_price": float(parsed.get("price", 0))},
-                            )
+                            ))
                     elif status == "updated":
                         updated_count += 1
-                except Exception as e:
-                    logger.error(f"[{self.source}] Error processing listing: {e}")
-                    continue
+                await self.publish_events(events)
 
             self.run.listings_new = new_count
             self.run.listings_updated = updated_count
 
             await self.mark_missing()
-            await self.finish_run(success=True)
+            # The counters move before the commit and are reverted if it fails;
+            # the lock keeps the nightly reconciliation from reading SQL in between
+            async with counters_lock(self.redis):
+                published = await self.publish_counter_deltas()
+                try:
+                    await self.finish_run(success=True)
+                except Exception:
+                    if published:
+                        await self.publish_counter_deltas(undo=True)
+                    raise
+            await self.invalidate_caches()
 
             logger.info(
                 f"[{self.source}] Scrape complete: {len(raw_listings)} found, "
@@ -3,11 +3,21 @@ import logging
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
+from app.cache import invalidate_stats_cache
 from app.config import settings
 from app.database import async_session
 from app.services.dedup import run_deduplication
+from app.services.email_notifier import run_email_notifications
 from app.services.ruian import load_prague_ku_boundaries
 from app.services.ku_benchmarks import assign_ku_to_properties, compute_ku_price_stats
+from app.services.partitions import ensure_price_history_partitions
+from app.redis import redis_client
+from app.services.stats_counters import reconcile_counters
+from app.services.stats_views import (
+    refresh_price_drops,
+    refresh_property_stats,
+    snapshot_last_prices,
+)
 from scrapers.sreality import SrealityScraper
 from scrapers.bezrealitky import BezrealitkyScraper
 from scrapers.idnes import IdnesScraper
@@ -35,6 +45,13 @@ async def run_scraper(scraper_class):
         except Exception as e:
             logger.error(f"Deduplication after {scraper_class.source} failed: {e}")
 
+    # Publish the new counts to the dashboard
+    await run_stats_refresh()
+    try:
+        await invalidate_stats_cache()
+    except Exception as e:
+        logger.error(f"Stats cache invalidation failed: {e}")
+
 
 async def run_sreality():
     logger.info("Starting Sreality scrape...")
@@ -51,6 +68,62 @@ async def run_idnes():
     await run_scraper(IdnesScraper)
 
 
+async def run_stats_refresh():
+    """Refresh the dashboard counters materialized view."""
+    async with async_session() as session:
+        try:
+            await refresh_property_stats(session)
+        except Exception as e:
+            logger.error(f"Stats refresh failed: {e}")
+
+
+async def run_counter_reconciliation():
+    """Overwrite the Redis stats counters with values recomputed from SQL."""
+    async with async_session() as session:
+        try:
+            await reconcile_counters(session, redis_client)
+        except Exception as e:
+            logger.error(f"Stats counter reconciliation failed: {e}")
+
+
+async def run_price_drops_refresh():
+    """Refresh the daily price-drop materialized view."""
+    async with async_session() as session:
+        try:
+            await refresh_price_drops(session)
+        except Exception as e:
+            logger.error(f"Price drops refresh failed: {e}")
+
+
+async def run_last_price_snapshot():
+    """Snapshot yesterday's closing prices, then recount today's price drops."""
+    async with async_session() as session:
+        try:
+            await snapshot_last_prices(session)
+        except Exception as e:
+            logger.error(f"Last price snapshot failed: {e}")
+            return
+    await run_price_drops_refresh()
+
+
+async def run_partition_maintenance():
+    """Pre-create upcoming monthly price_history partitions."""
+    async with async_session() as session:
+        try:
+            await ensure_price_history_partitions(session)
+        except Exception as e:
+            logger.error(f"Price history partition maintenance failed: {e}")
+
+
+async def run_email_subscriptions():
+    """Match subscriptions against recent listings and send notification emails."""
+    async with async_session() as session:
+        try:
+            await run_email_notifications(session)
+        except Exception as e:
+            logger.error(f"Email notifications failed: {e}")
+
+
 async def run_ku_pipeline():
     """Assign KÚ codes to Prague properties and recompute price benchmarks."""
     logger.info("Starting KÚ assignment and benchmark computation...")
@@ -114,6 +187,66 @@ def setup_scheduler():
         max_instances=1,
     )
 
+    # Dashboard stats views: counters every 5 minutes, price drops hourly
+    scheduler.add_job(
+        run_stats_refresh,
+        "interval",
+        minutes=5,
+        id="stats_refresh",
+        name="Stats View Refresh",
+        max_instances=1,
+    )
+    scheduler.add_job(
+        run_price_drops_refresh,
+        "interval",
+        hours=1,
+        id="price_drops_refresh",
+        name="Price Drops View Refresh",
+        max_instances=1,
+    )
+
+    # Email subscription notifications
+    scheduler.add_job(
+        run_email_subscriptions,
+        "interval",
+        minutes=15,
+        id="email_notifications",
+        name="Email Subscription Notifications",
+        max_instances=1,
+    )
+
+    # Previous-day price snapshot for price drops: 00:05 UTC
+    scheduler.add_job(
+        run_last_price_snapshot,
+        "cron",
+        hour=0,
+        minute=5,
+        timezone="UTC",
+        id="last_price_snapshot",
+        name="Last Price Snapshot",
+        max_instances=1,
+    )
+
+    # Price history partitions: daily at 1 AM (idempotent, keeps months ahead)
+    scheduler.add_job(
+        run_partition_maintenance,
+        "cron",
+        hour=1,
+        id="price_history_partitions",
+        name="Price History Partitions",
+        max_instances=1,
+    )
+
+    # Stats counter reconciliation: nightly at 2 AM
+    scheduler.add_job(
+        run_counter_reconciliation,
+        "cron",
+        hour=2,
+        id="stats_counter_reconciliation",
+        name="Stats Counter Reconciliation",
+        max_instances=1,
+    )
+
     # KÚ assignment + benchmark computation: daily at 3 AM
     scheduler.add_job(
         run_ku_pipeline,
@@ -159,6 +292,9 @@ async def run_initial_scrape():
     """Run all scrapers once at startup with staggered delays."""
     logger.info("Running initial scrape for all sources...")
 
+    # Seed the Redis stats counters before scrapers start adjusting them
+    await run_counter_reconciliation()
+
     # Load RUIAN KÚ boundaries first (fast, idempotent)
     async with async_session() as session:
         try:
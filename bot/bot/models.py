@@ -2,9 +2,12 @@
 Lightweight ORM models for the Telegram bot.
 These mirror the backend's database schema (read/write to the same tables).
 Keep in sync with backend/app/models.py when schema changes.
+
+The bot runs in its own image without the backend package, so it keeps a
+separate metadata with only the columns it reads; each table is defined once.
 """
 from sqlalchemy import (
-    BigInteger, Boolean, DateTime, ForeignKey, Integer, Numeric,
+    BigInteger, Boolean, DateTime, ForeignKey, Numeric,
     String, Text, Float,
 )
 from sqlalchemy.dialects.postgresql import JSONB
@@ -18,7 +21,6 @@ class Base(DeclarativeBase):
 
 class Property(Base):
     __tablename__ = "properties"
-    __table_args__ = {"extend_existing": True}
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     source: Mapped[str] = mapped_column(String(50))
@@ -41,7 +43,6 @@ class Property(Base):
 
 class UserFilter(Base):
     __tablename__ = "user_filters"
-    __table_args__ = {"extend_existing": True}
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     telegram_chat_id: Mapped[int] = mapped_column(BigInteger)
@@ -64,7 +65,6 @@ class UserFilter(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
-    __table_args__ = {"extend_existing": True}
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_filter_id: Mapped[int | None] = mapped_column(BigInteger, ForeignKey("user_filters.id"))
@@ -78,6 +78,8 @@ export default function Dashboard() {
                 total={data?.total || 0}
                 page={data?.page || 1}
                 pages={data?.pages || 0}
+                hasMore={data?.has_more}
+                estimatedTotal={data?.estimated_total}
                 onPageChange={(page) => setFilters({ ...filters, page })}
                 avgPrices={avgPrices}
                 favoriteIds={favoriteIds}
@@ -9,6 +9,8 @@ interface Props {
   total: number;
   page: number;
   pages: number;
+  hasMore?: boolean;
+  estimatedTotal?: boolean;
   onPageChange: (page: number) => void;
   avgPrices?: AvgPriceM2Map;
   favoriteIds?: number[];
@@ -21,6 +23,8 @@ export default function PropertyList({
   total,
   page,
   pages,
+  hasMore,
+  estimatedTotal = false,
   onPageChange,
   avgPrices,
   favoriteIds = [],
@@ -59,7 +63,7 @@ export default function PropertyList({
     <div>
       <div className="flex items-center justify-between mb-4">
         <p className="text-sm text-gray-500">
-          {total.toLocaleString('cs-CZ')} vysledku
+          {estimatedTotal && '~'}{total.toLocaleString('cs-CZ')} vysledku
         </p>
       </div>
 
@@ -92,7 +96,7 @@ export default function PropertyList({
           </span>
           <button
             onClick={() => onPageChange(page + 1)}
-            disabled={page >= pages}
+            disabled={hasMore === undefined ? page >= pages : !hasMore}
             className="px-3 py-2 text-sm rounded-lg border border-gray-200 bg-white hover:bg-gray-50 disabled:opacity-40 disabled:cursor-not-allowed"
           >
             Dalsi
@@ -1,8 +1,9 @@
 'use client';
 
+import { useMemo } from 'react';
 import useSWR from 'swr';
-import { fetcher } from '@/lib/api';
-import type { PropertyListResponse, Stats, MapMarker, CityCount, PropertyFilters, AvgPriceM2Map } from '@/lib/types';
+import { fetcher, markersFromColumns } from '@/lib/api';
+import type { PropertyListResponse, Stats, MapMarkerColumns, CityCount, PropertyFilters, AvgPriceM2Map } from '@/lib/types';
 
 function buildQuery(filters: PropertyFilters): string {
   const params = new URLSearchParams();
@@ -37,13 +38,14 @@ export function useStats() {
 
 export function useMapMarkers(filters?: Partial<PropertyFilters>) {
   const query = filters ? buildQuery(filters as PropertyFilters) : '';
-  const { data, error, isLoading } = useSWR<MapMarker[]>(
+  const { data, error, isLoading } = useSWR<MapMarkerColumns>(
     `/api/properties/geo/markers?${query}`,
     fetcher,
     { refreshInterval: 120000 }
   );
+  const markers = useMemo(() => (data ? markersFromColumns(data) : []), [data]);
 
-  return { markers: data || [], error, isLoading };
+  return { markers, error, isLoading };
 }
 
 export function useCities() {
@@ -4,6 +4,7 @@ import type {
   PriceHistoryEntry,
   Stats,
   MapMarker,
+  MapMarkerColumns,
   CityCount,
   PropertyFilters,
   AvgPriceM2Map,
@@ -44,8 +45,21 @@ export async function getStats(): Promise<Stats> {
   return fetchApi<Stats>('/api/stats');
 }
 
+export function markersFromColumns(cols: MapMarkerColumns): MapMarker[] {
+  return cols.id.map((id, i) => ({
+    id,
+    lat: cols.lat[i],
+    lng: cols.lng[i],
+    price: cols.price[i],
+    disposition: cols.disposition[i],
+    title: cols.title[i],
+    source: cols.source[i],
+  }));
+}
+
 export async function getMapMarkers(filters?: Partial<PropertyFilters>): Promise<MapMarker[]> {
-  return fetchApi<MapMarker[]>('/api/properties/geo/markers', filters as Record<string, string | number | undefined>);
+  const cols = await fetchApi<MapMarkerColumns>('/api/properties/geo/markers', filters as Record<string, string | number | undefined>);
+  return markersFromColumns(cols);
 }
 
 export async function getCities(): Promise<CityCount[]> {
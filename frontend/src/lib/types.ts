@@ -44,6 +44,9 @@ export interface PropertyListResponse {
   page: number;
   per_page: number;
   pages: number;
+  has_more: boolean;
+  estimated_total: boolean;
+  next_cursor: string | null;
 }
 
 export interface Stats {
@@ -66,6 +69,17 @@ export interface MapMarker {
   source: string;
 }
 
+// Columnar /geo/markers payload: one array per MapMarker field
+export interface MapMarkerColumns {
+  id: number[];
+  lat: number[];
+  lng: number[];
+  price: (number | null)[];
+  disposition: (string | null)[];
+  title: (string | null)[];
+  source: string[];
+}
+
 export interface CityCount {
   city: string;
   label: string;
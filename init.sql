@@ -3,6 +3,42 @@
 -- Enable PostGIS extension
 CREATE EXTENSION IF NOT EXISTS postgis;
 
+-- Trigram matching for ILIKE '%...%' filters
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- SQL port of app.reference_prices.get_base_city ('praha-karlin-...' -> 'praha')
+CREATE OR REPLACE FUNCTION base_city(city TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    WITH n AS (
+        SELECT replace(translate(lower(trim(city)),
+            'áäčďéěíĺľňóôöŕřšťúůüýž',
+            'aacdeeillnooorrstuuuyz'), ' ', '-') AS norm
+    )
+    SELECT COALESCE(
+        (SELECT k FROM n, unnest(ARRAY[
+            'rychnov-nad-kneznou', 'jablonec-nad-nisou', 'brandys-nad-labem',
+            'jindrichuv-hradec', 'frantiskovy-lazne', 'valasske-mezirici',
+            'ceske-budejovice', 'zdar-nad-sazavou', 'uherske-hradiste',
+            'marianske-lazne', 'usti-nad-orlici', 'mlada-boleslav',
+            'usti-nad-labem', 'hradec-kralove', 'havlickuv-brod',
+            'cesky-krumlov', 'frydek-mistek', 'karlovy-vary', 'kutna-hora',
+            'strakonice', 'prachatice', 'litomerice', 'ceska-lipa', 'novy-jicin',
+            'domazlice', 'pardubice', 'pelhrimov', 'prostejov', 'rakovnik',
+            'rokycany', 'chomutov', 'litvinov', 'kromeriz', 'pribram', 'benesov',
+            'nymburk', 'klatovy', 'sokolov', 'teplice', 'liberec', 'trutnov',
+            'chrudim', 'svitavy', 'jihlava', 'hodonin', 'breclav', 'blansko',
+            'olomouc', 'sumperk', 'jesenik', 'ostrava', 'karvina', 'havirov',
+            'bruntal', 'kladno', 'beroun', 'melnik', 'tachov', 'semily',
+            'turnov', 'nachod', 'trebic', 'znojmo', 'vyskov', 'prerov', 'vsetin',
+            'trinec', 'praha', 'kolin', 'tabor', 'pisek', 'plzen', 'decin',
+            'louny', 'jicin', 'opava', 'cheb', 'most', 'brno', 'zlin'
+        ]) WITH ORDINALITY AS keys(k, ord)
+         WHERE n.norm = k OR n.norm LIKE k || '-%'
+         ORDER BY ord LIMIT 1),
+        (SELECT split_part(norm, '-', 1) FROM n)
+    )
+$$;
+
 CREATE TABLE IF NOT EXISTS properties (
     id BIGSERIAL PRIMARY KEY,
     source VARCHAR(50) NOT NULL,           -- 'sreality', 'bezrealitky', 'idnes'
@@ -16,33 +52,109 @@ CREATE TABLE IF NOT EXISTS properties (
     price NUMERIC(14, 2),
     price_currency VARCHAR(10) DEFAULT 'CZK',
     size_m2 NUMERIC(10, 2),
-    rooms INTEGER,
+    price_m2 NUMERIC(14, 2) GENERATED ALWAYS AS (
+        CASE WHEN size_m2 > 0 THEN price / size_m2 END
+    ) STORED,
+    rooms SMALLINT,
     latitude DOUBLE PRECISION,
     longitude DOUBLE PRECISION,
+    geom geometry(Point, 4326) GENERATED ALWAYS AS (
+        ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+    ) STORED,
     ku_kod INTEGER,
-    ku_nazev VARCHAR(200),
     city VARCHAR(200),
+    base_city VARCHAR(200) GENERATED ALWAYS AS (base_city(city)) STORED,
     district VARCHAR(200),
     address TEXT,
     images JSONB DEFAULT '[]'::jsonb,
-    raw_data JSONB DEFAULT '{}'::jsonb,
+    raw_data BYTEA DEFAULT '\x80'::bytea,  -- MessagePack
     status VARCHAR(20) DEFAULT 'active',  -- 'active', 'removed', 'sold'
     duplicate_of BIGINT REFERENCES properties(id) ON DELETE SET NULL,
-    missed_runs INTEGER DEFAULT 0,
+    missed_runs SMALLINT DEFAULT 0,
     first_seen_at TIMESTAMPTZ DEFAULT NOW(),
     last_seen_at TIMESTAMPTZ DEFAULT NOW(),
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
-    search_vector TSVECTOR,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(city, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(district, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(address, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(description, '')), 'C')
+    ) STORED,
     CONSTRAINT uq_source_external UNIQUE (source, external_id)
 );
 
+-- Price history: partitioned by month, see ensure_price_history_partitions()
 CREATE TABLE IF NOT EXISTS price_history (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     property_id BIGINT NOT NULL REFERENCES properties(id) ON DELETE CASCADE,
     price NUMERIC(14, 2) NOT NULL,
     price_per_m2 NUMERIC(14, 2),
-    recorded_at TIMESTAMPTZ DEFAULT NOW()
+    recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+-- Monthly partitions from from_date's month through months_ahead months past
+-- the current one. Idempotent; the scheduler calls it daily. A missing month's
+-- rows are moved out of the default partition when it is created.
+CREATE OR REPLACE FUNCTION ensure_price_history_partitions(
+    from_date DATE DEFAULT CURRENT_DATE, months_ahead INT DEFAULT 2
+)
+RETURNS VOID AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::date;
+    last_month DATE := (date_trunc('month', now() AT TIME ZONE 'UTC')
+                        + make_interval(months => months_ahead))::date;
+    part_name TEXT;
+    range_start TIMESTAMPTZ;
+    range_end TIMESTAMPTZ;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        part_name := 'price_history_' || to_char(month_start, 'YYYY_MM');
+        range_start := month_start::timestamp AT TIME ZONE 'UTC';
+        range_end := (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+        IF to_regclass(part_name) IS NULL THEN
+            BEGIN
+                -- Rows that reached the default partition while this month
+                -- was missing would block the attach, so move them first
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE price_history INCLUDING DEFAULTS)',
+                    part_name
+                );
+                IF to_regclass('price_history_default') IS NOT NULL THEN
+                    EXECUTE format(
+                        'WITH moved AS (DELETE FROM price_history_default '
+                        'WHERE recorded_at >= %L AND recorded_at < %L RETURNING *) '
+                        'INSERT INTO %I SELECT * FROM moved',
+                        range_start, range_end, part_name
+                    );
+                END IF;
+                EXECUTE format(
+                    'ALTER TABLE price_history ATTACH PARTITION %I '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    part_name, range_start, range_end
+                );
+            EXCEPTION WHEN OTHERS THEN
+                -- Keep going so later months still get their partitions
+                RAISE WARNING 'Could not create partition %: %', part_name, SQLERRM;
+            END;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_price_history_partitions();
+
+-- Catches rows outside the pre-created months (e.g. if the job stalls)
+CREATE TABLE IF NOT EXISTS price_history_default PARTITION OF price_history DEFAULT;
+
+-- Each property's last price before the current UTC day (nightly snapshot)
+CREATE TABLE IF NOT EXISTS property_last_price (
+    property_id BIGINT PRIMARY KEY REFERENCES properties(id) ON DELETE CASCADE,
+    price NUMERIC(14, 2) NOT NULL,
+    snapshot_date DATE NOT NULL
 );
 
 CREATE TABLE IF NOT EXISTS user_filters (
@@ -84,27 +196,26 @@ CREATE TABLE IF NOT EXISTS scrape_runs (
     status VARCHAR(20) DEFAULT 'running'  -- 'running', 'completed', 'failed'
 );
 
--- Price history trigger
-CREATE OR REPLACE FUNCTION track_price_change()
+-- Price history: one INSERT ... SELECT per statement over the transition tables
+CREATE OR REPLACE FUNCTION record_price_changes()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF OLD.price IS DISTINCT FROM NEW.price THEN
-        INSERT INTO price_history (property_id, price, price_per_m2)
-        VALUES (
-            NEW.id,
-            NEW.price,
-            CASE WHEN NEW.size_m2 > 0 THEN ROUND(NEW.price / NEW.size_m2, 2) END
-        );
-        NEW.updated_at = NOW();
-    END IF;
-    RETURN NEW;
+    INSERT INTO price_history (property_id, price, price_per_m2)
+    SELECT n.id, n.price,
+           CASE WHEN n.size_m2 > 0 THEN ROUND(n.price / n.size_m2, 2) END
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    WHERE n.price IS NOT NULL
+      AND o.price IS DISTINCT FROM n.price;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_price_change
-    BEFORE UPDATE ON properties
-    FOR EACH ROW
-    EXECUTE FUNCTION track_price_change();
+    AFTER UPDATE ON properties
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION record_price_changes();
 
 -- Auto-update updated_at
 CREATE OR REPLACE FUNCTION update_updated_at()
@@ -120,35 +231,84 @@ CREATE TRIGGER trg_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at();
 
--- Insert initial price history on new listing
-CREATE OR REPLACE FUNCTION record_initial_price()
+-- Insert initial price history for new listings
+CREATE OR REPLACE FUNCTION record_initial_prices()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF NEW.price IS NOT NULL THEN
-        INSERT INTO price_history (property_id, price, price_per_m2)
-        VALUES (
-            NEW.id,
-            NEW.price,
-            CASE WHEN NEW.size_m2 > 0 THEN ROUND(NEW.price / NEW.size_m2, 2) END
-        );
-    END IF;
-    RETURN NEW;
+    INSERT INTO price_history (property_id, price, price_per_m2)
+    SELECT n.id, n.price,
+           CASE WHEN n.size_m2 > 0 THEN ROUND(n.price / n.size_m2, 2) END
+    FROM new_rows n
+    WHERE n.price IS NOT NULL;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_initial_price
     AFTER INSERT ON properties
-    FOR EACH ROW
-    EXECUTE FUNCTION record_initial_price();
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION record_initial_prices();
 
 -- Indexes
-CREATE INDEX IF NOT EXISTS idx_properties_filters
-    ON properties (city, property_type, transaction_type);
+CREATE INDEX IF NOT EXISTS idx_properties_active_filter
+    ON properties (transaction_type, property_type, disposition, price)
+    INCLUDE (size_m2)
+    WHERE duplicate_of IS NULL AND status = 'active';
 
 CREATE INDEX IF NOT EXISTS idx_properties_price_active
     ON properties (price)
     WHERE status = 'active';
 
+CREATE INDEX IF NOT EXISTS idx_properties_active_newest
+    ON properties (first_seen_at DESC, id DESC)
+    INCLUDE (price, size_m2, disposition, title, source, latitude, longitude)
+    WHERE duplicate_of IS NULL AND status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_price
+    ON properties (price)
+    INCLUDE (id, first_seen_at)
+    WHERE duplicate_of IS NULL AND status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_price_m2
+    ON properties (price_m2)
+    WHERE duplicate_of IS NULL AND status = 'active';
+
+-- KÚ price stats aggregation (compute_ku_price_stats)
+CREATE INDEX IF NOT EXISTS idx_properties_ku_price_m2
+    ON properties (ku_kod, property_type, transaction_type, price_m2)
+    WHERE status = 'active' AND duplicate_of IS NULL
+      AND price_m2 BETWEEN 5000 AND 500000;
+
+CREATE INDEX IF NOT EXISTS idx_properties_avg_price
+    ON properties (transaction_type, property_type)
+    INCLUDE (price_m2, ku_kod, city, disposition)
+    WHERE status = 'active' AND duplicate_of IS NULL AND price_m2 IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_dims
+    ON properties (source, property_type, transaction_type)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_active_first_seen
+    ON properties (first_seen_at)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_removed_updated
+    ON properties (updated_at)
+    WHERE status = 'removed';
+
+CREATE INDEX IF NOT EXISTS idx_properties_base_city
+    ON properties (base_city)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_city_trgm
+    ON properties USING GIN (city gin_trgm_ops)
+    WHERE duplicate_of IS NULL AND status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_properties_district_trgm
+    ON properties USING GIN (district gin_trgm_ops)
+    WHERE duplicate_of IS NULL AND status = 'active';
+
 CREATE INDEX IF NOT EXISTS idx_properties_last_seen
     ON properties (last_seen_at);
 
@@ -159,6 +319,16 @@ CREATE INDEX IF NOT EXISTS idx_properties_geo
     ON properties (latitude, longitude)
     WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
 
+-- Points still waiting for KÚ assignment (spatial join against prague_ku)
+CREATE INDEX IF NOT EXISTS idx_properties_geom
+    ON properties USING GIST (geom)
+    WHERE ku_kod IS NULL;
+
+-- Deduplication self-join of active listings within 50 m
+CREATE INDEX IF NOT EXISTS idx_properties_geom_active
+    ON properties USING GIST (geom)
+    WHERE status = 'active' AND duplicate_of IS NULL;
+
 CREATE INDEX IF NOT EXISTS idx_properties_duplicate
     ON properties (duplicate_of)
     WHERE duplicate_of IS NOT NULL;
@@ -166,6 +336,9 @@ CREATE INDEX IF NOT EXISTS idx_properties_duplicate
 CREATE INDEX IF NOT EXISTS idx_price_history_property
     ON price_history (property_id, recorded_at DESC);
 
+CREATE INDEX IF NOT EXISTS idx_price_history_recorded_at
+    ON price_history (recorded_at);
+
 CREATE INDEX IF NOT EXISTS idx_user_filters_chat
     ON user_filters (telegram_chat_id)
     WHERE active = TRUE;
@@ -174,27 +347,9 @@ CREATE INDEX IF NOT EXISTS idx_notifications_property
     ON notifications (property_id, notification_type);
 
 -- Full-text search: generated column + GIN index
-CREATE OR REPLACE FUNCTION properties_search_vector_update()
-RETURNS TRIGGER AS $$
-BEGIN
-    NEW.search_vector :=
-        setweight(to_tsvector('simple', COALESCE(NEW.title, '')), 'A') ||
-        setweight(to_tsvector('simple', COALESCE(NEW.city, '')), 'A') ||
-        setweight(to_tsvector('simple', COALESCE(NEW.district, '')), 'B') ||
-        setweight(to_tsvector('simple', COALESCE(NEW.address, '')), 'B') ||
-        setweight(to_tsvector('simple', COALESCE(NEW.description, '')), 'C');
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-CREATE TRIGGER trg_search_vector
-    BEFORE INSERT OR UPDATE OF title, city, district, address, description
-    ON properties
-    FOR EACH ROW
-    EXECUTE FUNCTION properties_search_vector_update();
-
 CREATE INDEX IF NOT EXISTS idx_properties_search
-    ON properties USING GIN (search_vector);
+    ON properties USING GIN (search_vector)
+    WITH (fastupdate = off);
 
 -- Favorites table
 CREATE TABLE IF NOT EXISTS favorites (
@@ -202,12 +357,9 @@ CREATE TABLE IF NOT EXISTS favorites (
     session_id VARCHAR(100) NOT NULL,       -- anonymous browser session or user id
     property_id BIGINT NOT NULL REFERENCES properties(id) ON DELETE CASCADE,
     created_at TIMESTAMPTZ DEFAULT NOW(),
-    CONSTRAINT uq_favorite UNIQUE (session_id, property_id)
+    CONSTRAINT uq_favorite UNIQUE (session_id, property_id) INCLUDE (id, created_at)
 );
 
-CREATE INDEX IF NOT EXISTS idx_favorites_session
-    ON favorites (session_id);
-
 -- Email subscriptions table
 CREATE TABLE IF NOT EXISTS email_subscriptions (
     id BIGSERIAL PRIMARY KEY,
@@ -230,6 +382,25 @@ CREATE INDEX IF NOT EXISTS idx_email_subscriptions_email
     ON email_subscriptions (email)
     WHERE active = TRUE;
 
+CREATE INDEX IF NOT EXISTS idx_email_subscriptions_match
+    ON email_subscriptions (transaction_type, property_type)
+    WHERE active = TRUE;
+
+-- Subscription matches waiting to be emailed (filled by the notifier job)
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    subscription_id BIGINT NOT NULL REFERENCES email_subscriptions(id) ON DELETE CASCADE,
+    property_id BIGINT NOT NULL REFERENCES properties(id) ON DELETE CASCADE,
+    kind VARCHAR(20) NOT NULL,               -- 'new_listing', 'price_drop'
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    sent_at TIMESTAMPTZ,
+    CONSTRAINT uq_email_outbox UNIQUE (subscription_id, property_id, kind)
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_pending
+    ON email_outbox (subscription_id)
+    WHERE sent_at IS NULL;
+
 -- KÚ index on properties
 CREATE INDEX IF NOT EXISTS idx_properties_ku
     ON properties (ku_kod)
@@ -243,13 +414,19 @@ CREATE TABLE IF NOT EXISTS prague_ku (
     geom GEOMETRY(MultiPolygon, 4326) NOT NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_prague_ku_geom ON prague_ku USING GIST (geom);
+CREATE INDEX IF NOT EXISTS idx_prague_ku_geom ON prague_ku USING SPGIST (geom);
 
 -- Computed price stats per KÚ
 CREATE TABLE IF NOT EXISTS ku_price_stats (
     id SERIAL PRIMARY KEY,
     ku_kod INTEGER NOT NULL,
     ku_nazev VARCHAR(200) NOT NULL,
+    -- ku_nazev in normalize_city() form ("Nové Město" -> "nove-mesto")
+    ku_nazev_normalized VARCHAR(200) GENERATED ALWAYS AS (
+        replace(translate(lower(trim(ku_nazev)),
+            'áäčďéěíĺľňóôöŕřšťúůüýž',
+            'aacdeeillnooorrstuuuyz'), ' ', '-')
+    ) STORED,
     property_type VARCHAR(30),
     transaction_type VARCHAR(20) NOT NULL,
     median_price_m2 NUMERIC(14, 2),
@@ -259,6 +436,9 @@ CREATE TABLE IF NOT EXISTS ku_price_stats (
     CONSTRAINT uq_ku_price_stats UNIQUE (ku_kod, property_type, transaction_type)
 );
 
+CREATE INDEX IF NOT EXISTS idx_ku_price_stats_nazev_normalized
+    ON ku_price_stats (ku_nazev_normalized varchar_pattern_ops);
+
 -- Shared external reference benchmarks table
 CREATE TABLE IF NOT EXISTS reference_benchmarks (
     id SERIAL PRIMARY KEY,
@@ -271,3 +451,61 @@ CREATE TABLE IF NOT EXISTS reference_benchmarks (
     fetched_at TIMESTAMPTZ DEFAULT NOW(),
     CONSTRAINT uq_ref_benchmark UNIQUE (source, region, property_type, transaction_type, period)
 );
+
+-- Dashboard stats snapshots (refreshed by the scheduler)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_property_stats AS
+WITH bounds AS (
+    SELECT date_trunc('day', now(), 'UTC') AS today_start
+),
+totals AS (
+    SELECT
+        count(*) FILTER (WHERE p.status = 'active') AS total_active,
+        count(*) FILTER (WHERE p.status = 'active'
+                           AND p.first_seen_at >= b.today_start) AS new_today,
+        count(*) FILTER (WHERE p.status = 'removed'
+                           AND p.updated_at >= b.today_start) AS removed_today
+    FROM properties p, bounds b
+),
+grouped AS (
+    SELECT
+        source, property_type, transaction_type,
+        GROUPING(source, property_type, transaction_type) AS grp,
+        count(*) AS cnt
+    FROM properties
+    WHERE status = 'active'
+    GROUP BY GROUPING SETS ((source), (property_type), (transaction_type))
+)
+SELECT
+    1 AS bucket,
+    t.total_active,
+    t.new_today,
+    t.removed_today,
+    COALESCE((SELECT jsonb_object_agg(source, cnt) FROM grouped
+              WHERE grp = 3), '{}'::jsonb) AS by_source,
+    COALESCE((SELECT jsonb_object_agg(property_type, cnt) FROM grouped
+              WHERE grp = 5 AND property_type IS NOT NULL), '{}'::jsonb) AS by_type,
+    COALESCE((SELECT jsonb_object_agg(transaction_type, cnt) FROM grouped
+              WHERE grp = 6 AND transaction_type IS NOT NULL), '{}'::jsonb) AS by_transaction,
+    now() AS refreshed_at
+FROM totals t;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_property_stats ON mv_property_stats (bucket);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_price_drops_daily AS
+WITH bounds AS (
+    SELECT date_trunc('day', now(), 'UTC') AS today_start
+),
+today AS (
+    SELECT ph.property_id, min(ph.price) AS price
+    FROM price_history ph, bounds b
+    WHERE ph.recorded_at >= b.today_start
+    GROUP BY ph.property_id
+)
+SELECT
+    (SELECT (today_start AT TIME ZONE 'UTC')::date FROM bounds) AS day,
+    count(*) AS price_drops
+FROM today
+JOIN property_last_price lp ON lp.property_id = today.property_id
+WHERE today.price < lp.price;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_price_drops_daily ON mv_price_drops_daily (day);